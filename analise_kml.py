@@ -0,0 +1,629 @@
+# Núcleo da análise dos arquivos KML, sem interface.
+#
+# Indexação do KML, medição das rotas e montagem das tabelas de rotas e GPON.
+# Este módulo não importa o Streamlit: é usado pelo aplicativo (projetos_kml),
+# pelo processamento em lote pela linha de comando (lote_kml) e pode ser
+# importado pelos processos filhos de um ProcessPoolExecutor.
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+from pykml import parser
+
+from arquivos_kml import abrir_kml, documentos_secundarios, icone_kmz
+from diagnostico import logger, medir_etapa
+from distancias import MODO_PADRAO, calcular_distancias_lote, distancias_segmentos, estimar_desvio
+from extracao_paralela import medir_textos
+from rotas import ArmazemCoordenadas, Rota, TextosCoordenadas, calcular_limites, ler_coordenadas
+
+# Função para calcular a distância total de uma LineString em metros
+def calcular_distancia_linestring(coordinates, modo_distancia=MODO_PADRAO):
+    distancia_total = float(distancias_segmentos(coordinates, modo_distancia).sum())
+    return round(distancia_total, 0)  # Arredonda para 0 casas decimais
+
+KML_NS = "{http://www.opengis.net/kml/2.2}"
+
+# Elementos visitados na construção do índice de pastas
+TAGS_INDICE = [KML_NS + tag for tag in ("Document", "Folder", "Placemark", "Style", "StyleMap", "name")]
+
+# Resultados da extração (extrair_dados_kml), acessados pelo nome do campo
+ResultadosKML = namedtuple("ResultadosKML", [
+    "distancia_total", "dados_por_pasta", "coordenadas_por_pasta", "cidades_coords", "dados_gpon",
+    "dados_em_andamento", "dados_concluido", "dados_link_parceiros", "desvio", "pastas_dentro_gpon",
+    "limites", "registros_rotas", "tabela_gpon", "distancia_concluida_por_pasta", "icone_cidades",
+])
+
+
+# Função auxiliar para ler o texto do primeiro filho <name> de um elemento
+def _nome_filho(elemento):
+    nome = elemento.find(KML_NS + "name")
+    if nome is None:
+        return None
+    return nome.text or ""
+
+
+# Função para extrair a cor do LineStyle de um elemento Style
+def _cor_estilo(estilo):
+    linestyle = estilo.find(".//" + KML_NS + "LineStyle")
+    if linestyle is not None:
+        color_tag = linestyle.find(".//" + KML_NS + "color")
+        if color_tag is not None:
+            kml_color = color_tag.text.strip()
+            return f"#{kml_color[6:8]}{kml_color[4:6]}{kml_color[2:4]}"
+    return None
+
+
+# Função para obter o styleUrl do par "normal" de um StyleMap (None se não houver)
+def _estilo_normal(mapa):
+    for par in mapa.iterfind(KML_NS + "Pair"):
+        chave = par.find(KML_NS + "key")
+        style_url = par.find(KML_NS + "styleUrl")
+        if chave is not None and (chave.text or "").strip() == "normal" and style_url is not None and style_url.text:
+            return style_url.text.strip()
+    return None
+
+
+# Função para resolver um id de estilo que aponta para um StyleMap (como os "msn_..." do
+# Google Earth): segue o estilo "normal" de cada StyleMap até chegar a um Style
+def _resolver_estilo(indice, style_id):
+    vistos = set()
+    while style_id in indice["mapas_estilos"] and style_id not in vistos:
+        vistos.add(style_id)
+        style_id = indice["mapas_estilos"][style_id]
+    return style_id
+
+
+# Função para resumir um Placemark: nome, estilo, LineStrings e ponto
+# As coordenadas das LineStrings vão para o armazém "linhas" do índice
+def _ler_placemark(placemark, pasta, linhas):
+    nome = _nome_filho(placemark)
+    style_url = placemark.find(KML_NS + "styleUrl")  # Filho direto: os de um StyleMap em linha são dos pares
+
+    indices_linhas = []
+    for coordinates_tag in placemark.iterfind(".//" + KML_NS + "LineString/" + KML_NS + "coordinates"):
+        indices_linhas.append(linhas.adicionar_texto(coordinates_tag.text))
+
+    ponto = None
+    point_tag = placemark.find(".//" + KML_NS + "Point/" + KML_NS + "coordinates")
+    if point_tag is not None:
+        coordenadas = ler_coordenadas(point_tag.text)
+        if len(coordenadas):  # Pontos sem coordenadas são ignorados
+            lat, lon = coordenadas[0].tolist()
+            ponto = (lat, lon)
+
+    return {
+        "nome": nome if nome is not None else "Sem Nome",
+        "style_id": style_url.text.strip().lstrip("#") if style_url is not None else None,
+        "linhas": indices_linhas,
+        "ponto": ponto,
+        "pasta": pasta,
+    }
+
+
+# Função para construir o índice de pastas do KML em uma única passagem em profundidade.
+# "eventos" vem de etree.iterwalk (árvore já carregada) ou de etree.iterparse (leitura
+# em fluxo); com liberar=True cada elemento é descartado assim que é indexado.
+#
+# As pastas (Document e Folder) ficam em pré-ordem: os descendentes da pasta i são
+# as pastas i+1 até "fim" - 1, e os seus Placemarks são os de "pm_inicio" até
+# "pm_fim" - 1. Cada pasta também guarda o pai, a profundidade e as categorias
+# (LINK, LINK PARCEIROS, CIDADES, GPON, CTO'S e status) usadas na extração.
+# As coordenadas de todas as LineStrings ficam em um ArmazemCoordenadas; com
+# adiar_coordenadas=True apenas os textos são guardados (TextosCoordenadas), para
+# serem lidos e medidos em paralelo por medir_linhas.
+def construir_indice(eventos, liberar=False, tipo_coordenadas=np.float64, adiar_coordenadas=False):
+    pastas = []
+    placemarks = []
+    hrefs_icones = {}
+    linhas = TextosCoordenadas(tipo_coordenadas) if adiar_coordenadas else ArmazemCoordenadas(tipo_coordenadas)
+    estilos = {}
+    mapas_estilos = {}  # id do StyleMap -> id do estilo "normal"
+    pilha = []  # Pastas abertas: (índice, elemento)
+
+    for evento, elemento in eventos:
+        tag = elemento.tag[len(KML_NS):]
+
+        if evento == "start":
+            if tag in ("Document", "Folder"):
+                pai = pilha[-1][0] if pilha else None
+                pastas.append({
+                    "tag": tag,
+                    "nome": None,
+                    "pai": pai,
+                    "filhos": [],
+                    "pm_inicio": len(placemarks),
+                    "pm_fim": None,
+                    "fim": None,
+                })
+                if pai is not None:
+                    pastas[pai]["filhos"].append(len(pastas) - 1)
+                pilha.append((len(pastas) - 1, elemento))
+            continue
+
+        if tag == "name":
+            # Apenas o primeiro <name> filho direto da pasta aberta é o nome dela
+            if pilha and elemento.getparent() is pilha[-1][1] and pastas[pilha[-1][0]]["nome"] is None:
+                pastas[pilha[-1][0]]["nome"] = elemento.text or ""
+            continue
+
+        if tag == "Placemark":
+            placemarks.append(_ler_placemark(elemento, pilha[-1][0] if pilha else None, linhas))
+        elif tag == "Style":
+            # Estilos sem id (em linha, dentro de um Placemark) não podem ser referenciados por styleUrl
+            if elemento.get("id") is not None:
+                cor = _cor_estilo(elemento)
+                if cor is not None:
+                    estilos[elemento.get("id")] = cor
+                href = elemento.find(".//" + KML_NS + "IconStyle/" + KML_NS + "Icon/" + KML_NS + "href")
+                if href is not None and href.text:
+                    hrefs_icones[elemento.get("id")] = href.text.strip()
+        elif tag == "StyleMap":
+            estilo_normal = _estilo_normal(elemento)
+            if elemento.get("id") is not None and estilo_normal is not None:
+                mapas_estilos[elemento.get("id")] = estilo_normal.lstrip("#")
+        else:
+            indice, _ = pilha.pop()
+            pastas[indice]["pm_fim"] = len(placemarks)
+            pastas[indice]["fim"] = len(pastas)
+
+        # Libera o elemento já indexado e os irmãos anteriores (apenas Placemarks e pastas:
+        # um Style ou StyleMap dentro de um Placemark termina antes dele, e liberá-lo
+        # apagaria o <name> e o <styleUrl> do Placemark antes da leitura)
+        if liberar and tag not in ("Style", "StyleMap"):
+            elemento.clear()
+            while elemento.getprevious() is not None:
+                del elemento.getparent()[0]
+
+    # Classifica as pastas; a pré-ordem garante que o pai é visitado antes dos filhos
+    for indice, pasta in enumerate(pastas):
+        nome_upper = (pasta["nome"] if pasta["nome"] is not None else "Desconhecido").upper()
+        pai = pastas[pasta["pai"]] if pasta["pai"] is not None else None
+        pasta["profundidade"] = pai["profundidade"] + 1 if pai else 0
+        pasta["link"] = "LINK" in nome_upper
+        pasta["link_parceiros"] = "LINK PARCEIROS" in nome_upper
+        pasta["cidades"] = "CIDADES" in nome_upper
+        pasta["gpon"] = "GPON" in nome_upper
+        pasta["ctos"] = "CTO'S" in nome_upper
+        # Alguma pasta acima desta tem "GPON" no nome
+        pasta["dentro_gpon"] = pai is not None and (
+            pai["dentro_gpon"] or (pai["nome"] is not None and "GPON" in pai["nome"].upper())
+        )
+        if "EM ANDAMENTO" in nome_upper:
+            pasta["status"] = "em_andamento"
+        elif "CONCLUÍDO" in nome_upper:
+            pasta["status"] = "concluido"
+        else:
+            pasta["status"] = None
+        # Pasta de status mais próxima (a própria ou uma acima)
+        if pasta["status"] is not None:
+            pasta["pasta_status"] = indice
+        else:
+            pasta["pasta_status"] = pai["pasta_status"] if pai else None
+
+    # Os ícones só são usados depois de resolvidos a partir de um KMZ (carregar_recursos_kmz)
+    return {
+        "pastas": pastas,
+        "placemarks": placemarks,
+        "linhas": linhas.finalizar(),
+        "estilos": estilos,
+        "mapas_estilos": mapas_estilos,
+        "hrefs_icones": hrefs_icones,
+        "icones": {},
+    }
+
+
+# Função para completar o índice com os recursos guardados no KMZ:
+# estilos e StyleMaps dos outros documentos .kml (styleUrl "arquivo.kml#id") e
+# ícones dos estilos guardados no arquivo, convertidos em data URI
+def carregar_recursos_kmz(indice, kmz):
+    for nome in documentos_secundarios(kmz):
+        with kmz.open(nome) as documento:
+            for _, estilo in etree.iterparse(documento, tag=(KML_NS + "Style", KML_NS + "StyleMap"), huge_tree=True):
+                if estilo.get("id") is None:
+                    continue  # Estilos em linha, lidos com o StyleMap que os contém
+                if estilo.tag == KML_NS + "StyleMap":
+                    estilo_normal = _estilo_normal(estilo)
+                    if estilo_normal is not None:
+                        # "#id" se refere a um estilo do próprio documento secundário
+                        indice["mapas_estilos"][f"{nome}#{estilo.get('id')}"] = f"{nome}{estilo_normal}" if estilo_normal.startswith("#") else estilo_normal
+                else:
+                    cor = _cor_estilo(estilo)
+                    if cor is not None:
+                        indice["estilos"][f"{nome}#{estilo.get('id')}"] = cor
+                estilo.clear()
+
+    for style_id, href in indice["hrefs_icones"].items():
+        icone = icone_kmz(kmz, href)
+        if icone is not None:
+            indice["icones"][style_id] = icone
+
+
+# Função para medir todas as LineStrings do índice em uma única chamada ao motor de distâncias
+# Se o índice guardou apenas os textos das coordenadas, a leitura e a medição são feitas em
+# "trabalhadores" processos, e o índice passa a ter o ArmazemCoordenadas resultante.
+# Retorna a distância arredondada de cada LineString e o desvio estimado do modo em relação ao geodesic exato
+def medir_linhas(indice, modo_distancia=MODO_PADRAO, trabalhadores=None):
+    if isinstance(indice["linhas"], TextosCoordenadas):
+        indice["linhas"], segmentos, totais = medir_textos(indice["linhas"], modo_distancia, trabalhadores)
+        coordenadas = indice["linhas"].coordenadas
+        inicios = indice["linhas"].inicios[:-1]
+    else:
+        coordenadas = indice["linhas"].coordenadas
+        inicios = indice["linhas"].inicios[:-1]
+        segmentos, totais = calcular_distancias_lote(coordenadas, inicios, modo_distancia)
+
+    desvio = estimar_desvio(coordenadas, inicios, modo_distancia, segmentos, totais)
+    return [round(float(total), 0) for total in totais], desvio
+
+
+def processar_folder_link(indice, i, distancias):
+    pasta = indice["pastas"][i]
+
+    # Verifica se a pasta está dentro de uma pasta "GPON"
+    if pasta["dentro_gpon"]:
+        return 0.0, [], [], [], [], False  # Retorna valores vazios se estiver dentro de uma pasta GPON
+
+    distancia_folder = 0.0
+    dados = []
+    coordenadas_folder = []
+    dados_em_andamento = []
+    dados_concluido = []
+
+    # Verifica se o nome da pasta contém "LINK PARCEIROS"
+    nome_folder = pasta["nome"] if pasta["nome"] is not None else "Desconhecido"
+    is_link_parceiros = pasta["link_parceiros"]
+
+    # Define a cor com base no nome da pasta
+    if is_link_parceiros:
+        color = "red"  # Cor vermelha para "LINK PARCEIROS"
+    elif "AMARELO" in nome_folder.upper():
+        color = "yellow"
+    elif "VERDE" in nome_folder.upper():
+        color = "green"
+    else:
+        color = "blue"  # Cor padrão para "LINK"
+
+    placemarks = indice["placemarks"][pasta["pm_inicio"]:pasta["pm_fim"]]
+
+    # Se for "LINK PARCEIROS", processa diretamente as LineString
+    if is_link_parceiros:
+        for placemark in placemarks:
+            for linha in placemark["linhas"]:
+                distancia = distancias[linha]
+                distancia_folder += distancia
+
+                # Adiciona as informações às listas correspondentes
+                dados.append([nome_folder, placemark["nome"], distancia])  # Inclui o nome da pasta
+                coordenadas_folder.append(Rota(nome_folder, placemark["nome"], color, "solid", indice["linhas"], linha, distancia, parceiros=True))  # Sólido para "LINK PARCEIROS"
+
+        return distancia_folder, dados, coordenadas_folder, [], [], is_link_parceiros
+
+    # Caso contrário, processa como pasta "LINK" normal: apenas Placemarks dentro de subpastas
+    for placemark in placemarks:
+        if placemark["pasta"] == i:
+            continue
+
+        # Usa a cor definida no estilo referenciado pelo styleUrl
+        style_id = _resolver_estilo(indice, placemark["style_id"])
+        if style_id is not None and style_id in indice["estilos"]:
+            color = indice["estilos"][style_id]
+
+        # O status vem da subpasta "EM ANDAMENTO" ou "CONCLUÍDO" mais próxima abaixo da pasta LINK
+        status = None
+        pasta_status = indice["pastas"][placemark["pasta"]]["pasta_status"]
+        if pasta_status is not None and indice["pastas"][pasta_status]["profundidade"] > pasta["profundidade"]:
+            status = indice["pastas"][pasta_status]["status"]
+
+        for linha in placemark["linhas"]:
+            distancia = distancias[linha]
+            distancia_folder += distancia
+
+            # Adiciona as informações às listas correspondentes
+            if status == "em_andamento":
+                dados_em_andamento.append([nome_folder, placemark["nome"], distancia])
+                line_style = "dashed"  # Tracejado para "EM ANDAMENTO"
+            elif status == "concluido":
+                dados_concluido.append([nome_folder, placemark["nome"], distancia])
+                line_style = "solid"  # Sólido para "CONCLUÍDO"
+            else:
+                dados.append([nome_folder, placemark["nome"], distancia])
+                line_style = "solid"  # Sólido para outras pastas
+            coordenadas_folder.append(Rota(nome_folder, placemark["nome"], color, line_style, indice["linhas"], linha, distancia, status))
+
+    return distancia_folder, dados, coordenadas_folder, dados_em_andamento, dados_concluido, is_link_parceiros
+
+
+
+# Função para buscar as pastas "CTO'S" abaixo de uma pasta do índice
+def buscar_ctos(indice, i):
+    pastas = indice["pastas"]
+    ctos_processados = set()  # Conjunto para rastrear pastas "CTO'S" já processadas
+    ctos = []
+
+    # Os descendentes de uma pasta ocupam as posições seguintes do índice, até "fim"
+    for j in range(i + 1, pastas[i]["fim"]):
+        subpasta = pastas[j]
+        nome_subpasta = subpasta["nome"] if subpasta["nome"] is not None else "Subpasta Desconhecida"
+
+        # Se a subpasta contiver "CTO'S" no nome e ainda não foi processada
+        if subpasta["ctos"] and nome_subpasta not in ctos_processados:
+            ctos_processados.add(nome_subpasta)  # Marca a pasta como processada
+            dados_cto = {"nome": nome_subpasta, "rotas": []}
+
+            # Processa as rotas dentro da subpasta CTO'S
+            for k in range(j + 1, subpasta["fim"]):
+                rota = pastas[k]
+                placemarks = indice["placemarks"][rota["pm_inicio"]:rota["pm_fim"]]
+                dados_cto["rotas"].append({
+                    "nome_rota": rota["nome"] if rota["nome"] is not None else "Rota Desconhecida",
+                    "quantidade_placemarks": rota["pm_fim"] - rota["pm_inicio"],
+                    # Pontos das CTO's: (latitude, longitude, nome)
+                    "pontos": [(*placemark["ponto"], placemark["nome"]) for placemark in placemarks if placemark["ponto"] is not None]
+                })
+
+            ctos.append(dados_cto)
+
+    return ctos
+
+# Função para processar uma subpasta de primeiro nível (POP) de uma pasta GPON
+def processar_pop_gpon(indice, i, distancias, limites_rotas):
+    subpasta = indice["pastas"][i]
+    nome_subpasta = subpasta["nome"] if subpasta["nome"] is not None else "Subpasta Desconhecida"
+    dados_subpasta = {"nome": nome_subpasta, "ctos": buscar_ctos(indice, i), "linestrings": []}
+
+    # Processa as LineStrings dentro da subpasta
+    linhas = []
+    for placemark in indice["placemarks"][subpasta["pm_inicio"]:subpasta["pm_fim"]]:
+        for linha in placemark["linhas"]:
+            dados_subpasta["linestrings"].append((placemark["nome"], distancias[linha]))
+            linhas.append(linha)
+
+    # Retângulo envolvente das LineStrings e das CTO's do POP, usado para enquadrar os mapas,
+    # combinando os retângulos já calculados de cada rota (limites_rotas do armazém)
+    minimos, maximos = limites_rotas
+    linhas = np.asarray(linhas, dtype=np.int64)
+    linhas = linhas[~np.isnan(minimos[linhas, 0])]  # Sem as rotas vazias
+    pontos_ctos = [ponto[:2] for cto in dados_subpasta["ctos"] for rota in cto["rotas"] for ponto in rota["pontos"]]
+    dados_subpasta["limites"] = calcular_limites(minimos[linhas], maximos[linhas], pontos_ctos)
+
+    return dados_subpasta
+
+# Função para criar a tabela colunar com um registro por rota medida:
+# pasta, rota, status ("em_andamento", "concluido" ou None), se é de parceiros,
+# se está em um POP de uma pasta GPON e a distância em metros.
+# As rotas LINK vêm primeiro, na ordem da extração, seguidas das LineStrings dos POPs GPON.
+def criar_registros_rotas(rotas, dados_gpon):
+    linestrings_gpon = [
+        (subpasta["nome"], nome, distancia)
+        for dados in dados_gpon.values()
+        for subpasta in dados["primeiro_nivel"]
+        for nome, distancia in subpasta["linestrings"]
+    ]
+    return pd.DataFrame({
+        "Pasta": [rota.pasta for rota in rotas] + [linha[0] for linha in linestrings_gpon],
+        "Rota": [rota.nome for rota in rotas] + [linha[1] for linha in linestrings_gpon],
+        "Status": [rota.status for rota in rotas] + [None] * len(linestrings_gpon),
+        "Parceiros": np.array([rota.parceiros for rota in rotas] + [False] * len(linestrings_gpon), dtype=bool),
+        "GPON": np.array([False] * len(rotas) + [True] * len(linestrings_gpon), dtype=bool),
+        "Distância (m)": np.array([rota.distancia for rota in rotas] + [linha[2] for linha in linestrings_gpon], dtype=np.float64),
+    })
+
+# Função para achatar os dados GPON em uma tabela organizada, com o POP como índice.
+# Cada POP tem uma linha com a fibra ótica das suas LineStrings; cada rota das pastas
+# CTO'S tem uma linha com a quantidade de CTO's; projetos sem rotas têm uma linha sem rota.
+def criar_tabela_gpon(dados_gpon):
+    linhas = []
+    for nome_gpon, dados in dados_gpon.items():
+        for subpasta in dados["primeiro_nivel"]:
+            fibra = sum(distancia for _, distancia in subpasta["linestrings"])
+            linhas.append((nome_gpon, subpasta["nome"], None, None, 0, float(fibra)))
+            for cto in subpasta["ctos"]:
+                if not cto["rotas"]:
+                    linhas.append((nome_gpon, subpasta["nome"], cto["nome"], None, 0, 0.0))
+                for rota in cto["rotas"]:
+                    linhas.append((nome_gpon, subpasta["nome"], cto["nome"], rota["nome_rota"], rota["quantidade_placemarks"], 0.0))
+
+    tabela = pd.DataFrame(linhas, columns=["GPON", "POP", "Projeto", "Rota", "CTO'S", "Fibra Ótica (metros)"])
+    tabela["CTO'S"] = tabela["CTO'S"].astype(np.int64)
+    tabela["Fibra Ótica (metros)"] = tabela["Fibra Ótica (metros)"].astype(np.float64)
+    return tabela.set_index("POP")
+
+# Função para montar uma tabela de rotas com ID, subtotal por pasta e total geral
+# As rotas vêm primeiro, seguidas dos subtotais (em ordem alfabética de pasta) e do total
+def criar_tabela_subtotais(registros, coluna_rota="Rota"):
+    distancias = registros["Distância (m)"]
+    subtotais = distancias.groupby(registros["Pasta"]).sum()
+
+    tabela = pd.concat([
+        pd.DataFrame({
+            "ID": np.arange(1, len(registros) + 1),
+            "Pasta": registros["Pasta"].to_numpy(),
+            coluna_rota: registros["Rota"].to_numpy(),
+            "Distância (m)": distancias.to_numpy(),
+        }),
+        pd.DataFrame({
+            "ID": "",
+            "Pasta": subtotais.index.to_numpy(),
+            coluna_rota: "Subtotal",
+            "Distância (m)": subtotais.to_numpy(),
+        }),
+        pd.DataFrame({"ID": [""], "Pasta": ["Total"], coluna_rota: [""], "Distância (m)": [distancias.sum()]}),
+    ], ignore_index=True)
+
+    # Define a coluna ID como índice do DataFrame
+    return tabela.set_index("ID")
+
+# Função para extrair os dados do índice e calcular distâncias
+# Com um Diagnostico (diagnostico.py), as etapas distancias, pastas e tabelas são medidas
+def extrair_dados_kml(indice, modo_distancia=MODO_PADRAO, trabalhadores=None, diagnostico=None):
+    with medir_etapa(diagnostico, "distancias"):
+        distancias, desvio = medir_linhas(indice, modo_distancia, trabalhadores)  # Distâncias de todas as LineStrings calculadas em lote
+    distancia_total = 0.0
+    dados_por_pasta = {}
+    coordenadas_por_pasta = {}
+    cidades_coords = []
+    dados_em_andamento = []
+    dados_concluido = []
+    dados_link_parceiros = []
+    dados_gpon = {}
+    pastas_dentro_gpon = set()  # Pastas LINK que estão dentro de uma pasta "GPON"
+    rotas_extraidas = []  # Rotas LINK e LINK PARCEIROS, na ordem em que são encontradas
+    distancia_concluida_por_pasta = {}  # Soma das rotas "CONCLUÍDO" de cada pasta LINK
+    icone_cidades = None  # Data URI do ícone das cidades, quando guardado no KMZ
+
+    with medir_etapa(diagnostico, "pastas"):
+        limites_rotas = indice["linhas"].limites_rotas()  # Retângulo de cada rota, para os limites dos POPs GPON
+        for i, pasta in enumerate(indice["pastas"]):
+            if pasta["tag"] != "Folder":
+                continue
+            nome_folder = pasta["nome"] if pasta["nome"] is not None else "Desconhecido"
+
+            # Evitar duplicação: Verificar se a pasta já foi processada
+            if nome_folder in dados_por_pasta:
+                continue  # Se já processamos essa pasta, pulamos para a próxima
+
+            # Processa pastas LINK e LINK PARCEIROS
+            if pasta["link"]:
+                if pasta["dentro_gpon"]:
+                    pastas_dentro_gpon.add(nome_folder)
+                distancia_folder, dados, coordenadas_folder, em_andamento, concluido, is_link_parceiros = processar_folder_link(indice, i, distancias)
+                distancia_total += distancia_folder
+
+                # Separa os dados dos "LINK PARCEIROS" dos dados da pasta "LINK"
+                if is_link_parceiros:
+                    dados_link_parceiros.extend(dados)  # Adiciona sem sobrescrever
+                    coordenadas_por_pasta.setdefault(nome_folder, []).extend(coordenadas_folder)
+                    rotas_extraidas.extend(coordenadas_folder)
+                else:
+                    # Adiciona apenas os dados gerais (não "EM ANDAMENTO" ou "CONCLUÍDO") ao dicionário
+                    if nome_folder not in dados_por_pasta:
+                        dados_por_pasta[nome_folder] = (distancia_folder, [])
+                    dados_por_pasta[nome_folder][1].extend(dados)  # Adiciona sem sobrescrever
+
+                    coordenadas_por_pasta.setdefault(nome_folder, []).extend(coordenadas_folder)
+                    rotas_extraidas.extend(coordenadas_folder)
+                    dados_em_andamento.extend(em_andamento)
+                    dados_concluido.extend(concluido)
+                    for linha in concluido:
+                        distancia_concluida_por_pasta[nome_folder] = distancia_concluida_por_pasta.get(nome_folder, 0) + linha[2]
+
+            # Processa pastas que contenham "CIDADES" no nome
+            if pasta["cidades"]:
+                for placemark in indice["placemarks"][pasta["pm_inicio"]:pasta["pm_fim"]]:
+                    if placemark["ponto"] is not None:
+                        cidades_coords.append((placemark["nome"], placemark["ponto"]))
+                        # Ícone das cidades: o primeiro ícone de estilo guardado no KMZ
+                        if icone_cidades is None:
+                            icone_cidades = indice["icones"].get(_resolver_estilo(indice, placemark["style_id"]))
+
+            # Processa pastas GPON
+            if pasta["gpon"]:
+                if nome_folder not in dados_gpon:
+                    dados_gpon[nome_folder] = {"primeiro_nivel": []}
+                nomes_subpastas = {sp["nome"] for sp in dados_gpon[nome_folder]["primeiro_nivel"]}
+
+                for filho in pasta["filhos"]:
+                    subpasta = indice["pastas"][filho]
+                    nome_subpasta = subpasta["nome"] if subpasta["nome"] is not None else "Subpasta Desconhecida"
+
+                    # Evita a duplicação da subpasta
+                    if nome_subpasta in nomes_subpastas:
+                        continue  # Já adicionamos essa subpasta, então pulamos
+                    nomes_subpastas.add(nome_subpasta)
+
+                    # Adiciona a subpasta do primeiro nível aos dados da pasta GPON
+                    dados_gpon[nome_folder]["primeiro_nivel"].append(processar_pop_gpon(indice, filho, distancias, limites_rotas))
+
+        # Retângulo envolvente das rotas e cidades exibidas no mapa, usado para enquadrar o mapa
+        linhas_mapa = [rota.linha for rotas in coordenadas_por_pasta.values() for rota in rotas]
+        limites = calcular_limites(indice["linhas"].selecionar(linhas_mapa), [coords for _, coords in cidades_coords])
+
+    with medir_etapa(diagnostico, "tabelas"):
+        registros_rotas = criar_registros_rotas(rotas_extraidas, dados_gpon)
+        tabela_gpon = criar_tabela_gpon(dados_gpon)
+
+    return ResultadosKML(
+        distancia_total=distancia_total,
+        dados_por_pasta=dados_por_pasta,
+        coordenadas_por_pasta=coordenadas_por_pasta,
+        cidades_coords=cidades_coords,
+        dados_gpon=dados_gpon,
+        dados_em_andamento=dados_em_andamento,
+        dados_concluido=dados_concluido,
+        dados_link_parceiros=dados_link_parceiros,
+        desvio=desvio,
+        pastas_dentro_gpon=pastas_dentro_gpon,
+        limites=limites,
+        registros_rotas=registros_rotas,
+        tabela_gpon=tabela_gpon,
+        distancia_concluida_por_pasta=distancia_concluida_por_pasta,
+        icone_cidades=icone_cidades,
+    )
+
+# Função para processar o KML (raiz já carregada por validar_kml) e calcular distâncias
+# Com trabalhadores > 1, as coordenadas são lidas e medidas em paralelo (extracao_paralela)
+# Se o documento veio de um KMZ, "kmz" é o arquivo zip aberto, de onde vêm estilos e ícones
+# Com um Diagnostico, cada etapa (indice, recursos_kmz e as da extração) é medida
+def processar_kml(root, modo_distancia=MODO_PADRAO, tipo_coordenadas=np.float64, trabalhadores=1, kmz=None, diagnostico=None):
+    with medir_etapa(diagnostico, "indice"):
+        eventos = etree.iterwalk(root, events=("start", "end"), tag=TAGS_INDICE)
+        indice = construir_indice(eventos, tipo_coordenadas=tipo_coordenadas, adiar_coordenadas=trabalhadores > 1)
+    if kmz is not None:
+        with medir_etapa(diagnostico, "recursos_kmz"):
+            carregar_recursos_kmz(indice, kmz)
+    return extrair_dados_kml(indice, modo_distancia, trabalhadores, diagnostico)
+
+
+# Função para processar o KML em fluxo (lxml iterparse) com memória limitada.
+# O índice é construído durante a leitura e cada elemento é descartado assim
+# que é indexado. Aceita um caminho ou um objeto de arquivo binário e retorna
+# as mesmas saídas de processar_kml. A etapa "leitura_indice" inclui a leitura do XML.
+# A memória ainda cresce com as coordenadas guardadas no índice e com as distâncias
+# por segmento, mas não com a árvore do XML.
+def processar_kml_streaming(fonte, modo_distancia=MODO_PADRAO, tipo_coordenadas=np.float64, trabalhadores=1, kmz=None, diagnostico=None):
+    with medir_etapa(diagnostico, "leitura_indice"):
+        eventos = etree.iterparse(fonte, events=("start", "end"), tag=TAGS_INDICE, huge_tree=True)
+        indice = construir_indice(eventos, liberar=True, tipo_coordenadas=tipo_coordenadas, adiar_coordenadas=trabalhadores > 1)
+    if kmz is not None:
+        with medir_etapa(diagnostico, "recursos_kmz"):
+            carregar_recursos_kmz(indice, kmz)
+    return extrair_dados_kml(indice, modo_distancia, trabalhadores, diagnostico)
+
+
+# Função para processar um arquivo KML, KMZ ou .kml.gz a partir do caminho, sem interface.
+# Com streaming=True o arquivo é lido em fluxo (processar_kml_streaming).
+# Erros de sintaxe do XML são propagados como etree.XMLSyntaxError.
+def processar_arquivo_kml(caminho, modo_distancia=MODO_PADRAO, streaming=False, tipo_coordenadas=np.float64, trabalhadores=1, diagnostico=None):
+    with open(caminho, "rb") as arquivo:
+        documento, kmz = abrir_kml(arquivo)
+        if streaming:
+            return processar_kml_streaming(documento, modo_distancia, tipo_coordenadas, trabalhadores, kmz, diagnostico)
+        with medir_etapa(diagnostico, "analise_xml"):
+            root = parser.parse(documento).getroot()
+        return processar_kml(root, modo_distancia, tipo_coordenadas, trabalhadores, kmz, diagnostico)
+
+
+# Função para calcular a porcentagem concluída de cada pasta LINK
+# As distâncias concluídas por pasta são acumuladas na extração (distancia_concluida_por_pasta)
+def calcular_porcentagem_concluida(dados_por_pasta, distancia_concluida_por_pasta):
+    porcentagens = {}
+    
+    # Verificação dos dados (apenas com o logger no nível DEBUG)
+    logger.debug("Dados por pasta: %s", dados_por_pasta)
+    logger.debug("Distância concluída por pasta: %s", distancia_concluida_por_pasta)
+   
+    # Itera sobre as pastas e calcula a porcentagem concluída
+    for nome_folder, (distancia_total, _) in dados_por_pasta.items():
+        distancia_concluida = distancia_concluida_por_pasta.get(nome_folder, 0)
+        
+        # Verifica se a distância total é maior que zero para evitar divisão por zero
+        if distancia_total > 0:
+            porcentagem = (distancia_concluida / distancia_total) * 100
+        else:
+            porcentagem = 0.0
+        
+        # Armazena a porcentagem no dicionário
+        porcentagens[nome_folder] = porcentagem
+    
+    return porcentagens
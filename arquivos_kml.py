@@ -0,0 +1,69 @@
+# Abertura dos arquivos enviados: KML, KML compactado com gzip (.kml.gz) e KMZ.
+#
+# O formato é reconhecido pelos primeiros bytes do conteúdo. Os arquivos
+# compactados são descompactados em fluxo: o leitor de XML recebe um objeto de
+# arquivo que descompacta aos poucos, sem gravar o documento inteiro em disco
+# nem mantê-lo descompactado em memória.
+#
+# Em um KMZ (zip), o documento principal é o doc.kml ou, na falta dele, o
+# primeiro .kml do arquivo. Os outros .kml do KMZ podem guardar estilos
+# (referenciados por styleUrl "arquivo.kml#id") e os ícones dos estilos podem
+# ser imagens guardadas no próprio KMZ; ambos são lidos do arquivo.
+import base64
+import gzip
+import mimetypes
+import posixpath
+import zipfile
+
+ASSINATURA_ZIP = b"PK\x03\x04"
+ASSINATURA_GZIP = b"\x1f\x8b"
+
+# Extensões aceitas no upload (".kml.gz" termina em "gz")
+EXTENSOES_KML = ["kml", "kmz", "gz"]
+
+
+# Função para abrir um arquivo KML, KMZ ou .kml.gz (caminho ou objeto de arquivo binário).
+# Retorna o documento KML como objeto de arquivo binário, descompactado em fluxo, e o
+# KMZ (zipfile.ZipFile) de onde ele veio, ou None se o arquivo não for um KMZ.
+def abrir_kml(fonte):
+    if isinstance(fonte, str):
+        fonte = open(fonte, "rb")
+
+    assinatura = fonte.read(4)
+    fonte.seek(0)
+
+    if assinatura.startswith(ASSINATURA_ZIP):
+        kmz = zipfile.ZipFile(fonte)
+        return kmz.open(documento_principal(kmz)), kmz
+    if assinatura.startswith(ASSINATURA_GZIP):
+        return gzip.GzipFile(fileobj=fonte, mode="rb"), None
+    return fonte, None
+
+
+# Função para escolher o documento principal de um KMZ
+def documento_principal(kmz):
+    documentos = [nome for nome in kmz.namelist() if nome.lower().endswith(".kml")]
+    if not documentos:
+        raise ValueError("O arquivo KMZ não contém nenhum documento .kml")
+    if "doc.kml" in documentos:
+        return "doc.kml"
+    return documentos[0]
+
+
+# Função para listar os outros documentos .kml do KMZ (onde pode haver estilos compartilhados)
+def documentos_secundarios(kmz):
+    principal = documento_principal(kmz)
+    return [nome for nome in kmz.namelist() if nome.lower().endswith(".kml") and nome != principal]
+
+
+# Função para ler uma imagem guardada no KMZ como data URI.
+# O caminho (href) é relativo ao documento principal. Retorna None se a imagem
+# não estiver no arquivo (por exemplo, um endereço da internet).
+def icone_kmz(kmz, href):
+    pasta = posixpath.dirname(documento_principal(kmz))
+    nomes = set(kmz.namelist())
+    for nome in (posixpath.normpath(posixpath.join(pasta, href)), posixpath.normpath(href)):
+        if nome in nomes:
+            tipo = mimetypes.guess_type(nome)[0] or "image/png"
+            return f"data:{tipo};base64,{base64.b64encode(kmz.read(nome)).decode('ascii')}"
+    return None
@@ -0,0 +1,55 @@
+# Compara a leitura dos blocos <coordinates> ponto a ponto (o código substituído,
+# que montava uma lista de tuplas (latitude, longitude)) com a leitura em bloco
+# de rotas.ler_coordenadas, que devolve um array (N, 2).
+#
+# Uso: python benchmarks/bench_coordenadas.py [quantidade_de_pontos] [repeticoes]
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rotas import ler_coordenadas
+
+
+# Função com a leitura antiga, como estava em processar_folder_link e processar_kml
+def ler_por_ponto(texto):
+    coordinates = texto.strip().split()
+    coordinates = [tuple(map(float, coord.split(',')[:2][::-1])) for coord in coordinates]
+    return coordinates
+
+
+# Função para gerar um texto de coordenadas com altitude e espaços irregulares
+def gerar_texto(quantidade, altitude=True):
+    rng = np.random.default_rng(0)
+    lon = -42.8 + rng.random(quantidade) * 0.1
+    lat = -5.1 + rng.random(quantidade) * 0.1
+    separadores = ["\n\t\t\t", " ", "  "]
+    partes = []
+    for i in range(quantidade):
+        ponto = f"{lon[i]:.8f},{lat[i]:.8f}" + (",0" if altitude else "")
+        partes.append(ponto + separadores[i % len(separadores)])
+    return "\n" + "".join(partes) + "\n"
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    for altitude in (True, False):
+        texto = gerar_texto(quantidade, altitude)
+        assert np.array_equal(np.array(ler_por_ponto(texto)), ler_coordenadas(texto))
+
+        tempo_ponto = min(timeit.repeat(lambda: ler_por_ponto(texto), number=1, repeat=repeticoes))
+        tempo_bloco = min(timeit.repeat(lambda: ler_coordenadas(texto), number=1, repeat=repeticoes))
+        print(
+            f"{quantidade} pontos, altitude={'sim' if altitude else 'não'}: "
+            f"ponto a ponto {tempo_ponto * 1000:.1f} ms, em bloco {tempo_bloco * 1000:.1f} ms "
+            f"({tempo_ponto / tempo_bloco:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Mede o tempo de carregamento da página inicial do aplicativo (antes do upload)
+# com as dependências pesadas carregadas sob demanda, comparado com o carregamento
+# de todas elas no início do script, como era feito antes.
+#
+# Cada medição roda em um processo Python novo (importação a frio), executando o
+# script do Streamlit sem servidor; o Streamlit exibe avisos por não haver sessão,
+# que são descartados.
+#
+# Uso: python benchmarks/bench_importacao.py [repeticoes]
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, "projetos_kml.py")
+
+# Dependências que o script importava no início antes do carregamento sob demanda
+DEPENDENCIAS_PESADAS = [
+    "pandas",
+    "folium",
+    "folium.plugins",
+    "plotly.express",
+    "pykml.parser",
+    "lxml.etree",
+    "geographiclib.geodesic",
+]
+
+# Código executado no processo novo; com "imediato", as dependências pesadas são importadas antes do script
+CODIGO = """
+import importlib, json, runpy, sys, time
+inicio = time.perf_counter()
+if {imediato!r}:
+    for modulo in {dependencias!r}:
+        importlib.import_module(modulo)
+runpy.run_path({script!r}, run_name="__main__")
+print(json.dumps({{
+    "segundos": time.perf_counter() - inicio,
+    "carregadas": [modulo for modulo in {dependencias!r} if modulo in sys.modules],
+}}))
+"""
+
+
+# Função para medir uma execução da página inicial em um processo novo
+def medir(imediato):
+    codigo = CODIGO.format(imediato=imediato, dependencias=DEPENDENCIAS_PESADAS, script=SCRIPT)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    medianas = {}
+    for nome, imediato in (("sob demanda", False), ("no início", True)):
+        medicoes = [medir(imediato) for _ in range(repeticoes)]
+        medianas[nome] = statistics.median(medicao["segundos"] for medicao in medicoes)
+        carregadas = ", ".join(medicoes[-1]["carregadas"]) or "nenhuma"
+        print(f"{nome:>12}: {medianas[nome] * 1000:7.1f} ms (mediana de {repeticoes}); dependências pesadas carregadas: {carregadas}")
+
+    reducao = medianas["no início"] - medianas["sob demanda"]
+    print(f"Redução: {reducao * 1000:.1f} ms ({reducao / medianas['no início'] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
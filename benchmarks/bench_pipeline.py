@@ -0,0 +1,220 @@
+# Benchmark das etapas do processamento, sobre KMLs sintéticos (gerar_kml) de
+# 1 mil a 1 milhão de vértices.
+#
+# Etapas medidas, na ordem do aplicativo:
+#   analise_xml    leitura do XML com o pykml (validar_kml)
+#   indice         construção do índice de pastas (construir_indice)
+#   distancias     medição de todas as LineStrings (medir_linhas)
+#   extracao       extração completa: medição, pastas, GPON e tabelas (extrair_dados_kml)
+#   tabelas        tabelas de subtotais exibidas no aplicativo (criar_tabela_subtotais)
+#   mapa           HTML do mapa com PolyLines (criar_mapa_html)
+#   mapa_geojson   HTML do mapa em camadas GeoJSON (criar_mapa_geojson_html)
+#   mapa_ctos      HTML do mapa das CTO's (criar_mapa_ctos_html)
+#   streaming      processamento completo em fluxo (processar_kml_streaming)
+#
+# O tempo de cada etapa é a mediana de "repeticoes" execuções; o pico de memória
+# vem de uma execução a mais com o tracemalloc (memória alocada pelo Python e
+# pelo NumPy; a árvore do lxml fica de fora e aparece no RSS máximo do processo).
+#
+# Os resultados são gravados em JSON; com --baseline, cada etapa é comparada com
+# um resultado salvo anteriormente e o programa termina com código 1 se alguma
+# etapa ficar mais lenta que a tolerância.
+#
+# Uso:
+#   python benchmarks/bench_pipeline.py [--escalas 1k 10k 100k 1M] [--repeticoes N]
+#                                       [--saida resultados.json] [--baseline base.json]
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree
+from pykml import parser
+
+from analise_kml import TAGS_INDICE, construir_indice, criar_tabela_subtotais, extrair_dados_kml, medir_linhas, processar_kml_streaming
+from distancias import MODO_PADRAO, MODOS_DISTANCIA
+from gerar_kml import gerar_kml
+from mapas_kml import criar_mapa_ctos_html, criar_mapa_geojson_html, criar_mapa_html
+
+ESCALAS = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+# Diferença mínima (segundos) para uma etapa ser considerada mais lenta ou mais rápida que a baseline
+DIFERENCA_MINIMA = 0.005
+
+
+# Função com as etapas do processamento; cada etapa recebe e completa o dicionário "estado"
+def etapas(caminho, modo_distancia):
+    def analise_xml(estado):
+        with open(caminho, "rb") as arquivo:
+            estado["root"] = parser.parse(arquivo).getroot()
+
+    def indice(estado):
+        eventos = etree.iterwalk(estado["root"], events=("start", "end"), tag=TAGS_INDICE)
+        estado["indice"] = construir_indice(eventos)
+
+    def distancias(estado):
+        medir_linhas(estado["indice"], modo_distancia)
+
+    def extracao(estado):
+        estado["resultados"] = extrair_dados_kml(estado["indice"], modo_distancia)
+
+    def tabelas(estado):
+        registros = estado["resultados"].registros_rotas
+        criar_tabela_subtotais(registros[~registros["Parceiros"] & ~registros["GPON"]])
+        criar_tabela_subtotais(registros[registros["Parceiros"]])
+
+    def mapa(estado):
+        resultados = estado["resultados"]
+        criar_mapa_html(resultados.coordenadas_por_pasta, resultados.cidades_coords, limites=resultados.limites)
+
+    def mapa_geojson(estado):
+        resultados = estado["resultados"]
+        criar_mapa_geojson_html(resultados.coordenadas_por_pasta, resultados.cidades_coords, limites=resultados.limites)
+
+    def mapa_ctos(estado):
+        criar_mapa_ctos_html(estado["resultados"].dados_gpon)
+
+    def streaming(estado):
+        processar_kml_streaming(caminho, modo_distancia)
+
+    return [analise_xml, indice, distancias, extracao, tabelas, mapa, mapa_geojson, mapa_ctos, streaming]
+
+
+# Função para medir uma etapa: mediana e mínimo dos tempos e pico de memória do tracemalloc
+def medir_etapa(etapa, estado, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        etapa(estado)
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        etapa(estado)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "segundos": statistics.median(tempos),
+        "minimo": min(tempos),
+        "pico_mb": pico / (1024 * 1024),
+    }
+
+
+# Função para obter o RSS máximo do processo até o momento, em MB (None se indisponível)
+def rss_maximo_mb():
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 1024 if sys.platform != "darwin" else maximo / (1024 * 1024)  # KB no Linux, bytes no macOS
+
+
+# Função para executar o benchmark nas escalas pedidas, da menor para a maior
+def executar(escalas, repeticoes, modo_distancia, diretorio, semente=0):
+    resultados = {
+        "criado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "modo_distancia": modo_distancia,
+        "repeticoes": repeticoes,
+        "escalas": {},
+    }
+
+    for nome in sorted(escalas, key=ESCALAS.get):
+        vertices = ESCALAS[nome]
+        caminho = os.path.join(diretorio, f"sintetico_{vertices}_{semente}.kml")
+        if not os.path.exists(caminho):
+            gerar_kml(caminho, vertices, semente)
+
+        estado = {}
+        medicoes = {}
+        for etapa in etapas(caminho, modo_distancia):
+            medicoes[etapa.__name__] = medir_etapa(etapa, estado, repeticoes)
+            print(
+                f"{nome:>5} {etapa.__name__:<13} {medicoes[etapa.__name__]['segundos'] * 1000:10.1f} ms "
+                f"{medicoes[etapa.__name__]['pico_mb']:9.1f} MB",
+                flush=True
+            )
+
+        resultados["escalas"][nome] = {
+            "vertices": vertices,
+            "rotas": len(estado["resultados"].registros_rotas),
+            "bytes": os.path.getsize(caminho),
+            "rss_maximo_mb": rss_maximo_mb(),
+            "etapas": medicoes,
+        }
+
+    return resultados
+
+
+# Função para comparar os resultados com uma baseline; retorna a lista de regressões
+def comparar(resultados, baseline, tolerancia):
+    regressoes = []
+    print(f"\nComparação com a baseline de {baseline.get('criado_em', '?')} (tolerância {tolerancia * 100:.0f}%):")
+    for nome, escala in resultados["escalas"].items():
+        escala_base = baseline.get("escalas", {}).get(nome)
+        if escala_base is None:
+            continue
+        for etapa, medicao in escala["etapas"].items():
+            medicao_base = escala_base["etapas"].get(etapa)
+            if medicao_base is None:
+                continue
+            atual, anterior = medicao["segundos"], medicao_base["segundos"]
+            razao = atual / anterior if anterior > 0 else float("inf")
+            situacao = ""
+            if razao > 1 + tolerancia and atual - anterior > DIFERENCA_MINIMA:
+                situacao = "REGRESSÃO"
+                regressoes.append((nome, etapa, razao))
+            elif razao < 1 - tolerancia and anterior - atual > DIFERENCA_MINIMA:
+                situacao = "melhora"
+            print(
+                f"{nome:>5} {etapa:<13} {anterior * 1000:10.1f} ms -> {atual * 1000:10.1f} ms "
+                f"({razao:5.2f}x) {situacao}"
+            )
+    return regressoes
+
+
+def main():
+    parser_argumentos = argparse.ArgumentParser(description="Benchmark das etapas do processamento de KML.")
+    parser_argumentos.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=["1k", "10k", "100k"], help="escalas medidas (padrão: 1k 10k 100k)")
+    parser_argumentos.add_argument("--repeticoes", type=int, default=3, help="execuções de cada etapa (padrão: 3)")
+    parser_argumentos.add_argument("--modo", choices=list(MODOS_DISTANCIA), default=MODO_PADRAO, help=f"cálculo de distâncias (padrão: {MODO_PADRAO})")
+    parser_argumentos.add_argument("--saida", default="resultados_pipeline.json", help="arquivo JSON dos resultados (padrão: resultados_pipeline.json)")
+    parser_argumentos.add_argument("--baseline", help="arquivo JSON de uma execução anterior para comparação")
+    parser_argumentos.add_argument("--tolerancia", type=float, default=0.15, help="aumento de tempo aceito em relação à baseline (padrão: 0.15)")
+    parser_argumentos.add_argument("--diretorio", default=os.path.join(tempfile.gettempdir(), "kml_benchmarks"), help="diretório dos KMLs sintéticos, reaproveitados entre execuções")
+    argumentos = parser_argumentos.parse_args()
+
+    os.makedirs(argumentos.diretorio, exist_ok=True)
+    resultados = executar(argumentos.escalas, argumentos.repeticoes, argumentos.modo, argumentos.diretorio)
+
+    with open(argumentos.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {argumentos.saida}")
+
+    if argumentos.baseline:
+        with open(argumentos.baseline, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultados, baseline, argumentos.tolerancia)
+        if regressoes:
+            print(f"{len(regressoes)} etapa(s) mais lenta(s) que a baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Gerador de arquivos KML sintéticos para os benchmarks.
+#
+# O arquivo segue as convenções de pastas lidas pelo aplicativo:
+#   LINK n           subpastas "EM ANDAMENTO", "CONCLUÍDO" e "TRECHOS" com as rotas
+#   LINK PARCEIROS   rotas de parceiros
+#   CIDADES          pontos das cidades
+#   REDE GPON        POPs com as LineStrings de fibra e as pastas "CTO'S PROJ",
+#                    cujas subpastas (rotas) guardam os pontos das CTO's
+#
+# "vertices" é o total de pontos das LineStrings; cerca de metade vai para as
+# pastas LINK, 10% para LINK PARCEIROS e o restante para os POPs. A geração é
+# determinística para a mesma semente, e o texto é gravado aos poucos, então
+# mesmo os arquivos de 1 milhão de vértices não ficam inteiros em memória.
+#
+# Uso: python benchmarks/gerar_kml.py SAIDA.kml [vertices] [--semente N] [--pontos-por-rota N]
+import argparse
+import gzip
+
+import numpy as np
+
+PONTOS_POR_ROTA = 100
+CTOS_POR_ROTA = 8
+
+CABECALHO = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+<name>KML sintético</name>
+<Style id="andamento"><LineStyle><color>ff00ffff</color><width>3</width></LineStyle></Style>
+<Style id="concluido"><LineStyle><color>ff00ff00</color><width>3</width></LineStyle></Style>
+"""
+
+
+# Função para gerar o texto de um bloco <coordinates> como um passeio aleatório a partir de (lat, lon)
+def texto_rota(rng, quantidade, lat, lon):
+    passos = rng.uniform(-0.002, 0.002, size=(quantidade, 2))
+    pontos = np.cumsum(passos, axis=0) + (lon, lat)
+    return " ".join(f"{ponto_lon:.7f},{ponto_lat:.7f},0" for ponto_lon, ponto_lat in pontos.tolist())
+
+
+# Função para gerar o texto de um Placemark com uma LineString
+def placemark_rota(rng, nome, quantidade, centro, estilo=None):
+    lat, lon = centro[0] + rng.uniform(-0.5, 0.5), centro[1] + rng.uniform(-0.5, 0.5)
+    style_url = f"<styleUrl>#{estilo}</styleUrl>" if estilo else ""
+    return (
+        f"<Placemark><name>{nome}</name>{style_url}<LineString><coordinates>\n"
+        f"{texto_rota(rng, quantidade, lat, lon)}\n</coordinates></LineString></Placemark>\n"
+    )
+
+
+# Função para gerar o texto de um Placemark com um ponto
+def placemark_ponto(rng, nome, centro):
+    lat, lon = centro[0] + rng.uniform(-0.5, 0.5), centro[1] + rng.uniform(-0.5, 0.5)
+    return f"<Placemark><name>{nome}</name><Point><coordinates>{lon:.7f},{lat:.7f},0</coordinates></Point></Placemark>\n"
+
+
+# Função para dividir "total" em "partes" quantidades inteiras que somam "total"
+def dividir(total, partes):
+    return [total // partes + (1 if i < total % partes else 0) for i in range(partes)]
+
+
+# Função para gravar um KML sintético com "vertices" pontos nas LineStrings em "saida" (caminho;
+# com a extensão .gz o arquivo é compactado). Retorna a quantidade de rotas (LineStrings) gravadas.
+def gerar_kml(saida, vertices, semente=0, pontos_por_rota=PONTOS_POR_ROTA):
+    rng = np.random.default_rng(semente)
+    rotas = max(10, vertices // pontos_por_rota)
+    pontos_rotas = dividir(vertices, rotas)
+
+    # Distribuição das rotas: metade nas pastas LINK, 10% em LINK PARCEIROS e o restante nos POPs
+    rotas_link = rotas // 2
+    rotas_parceiros = max(1, rotas // 10)
+    rotas_gpon = rotas - rotas_link - rotas_parceiros
+    pastas_link = max(1, rotas_link // 20)
+    pops = max(1, rotas_gpon // 10)
+    centros_pops = [(-5.09 + rng.uniform(-2, 2), -42.80 + rng.uniform(-2, 2)) for _ in range(pops)]
+    rotas_ctos = max(1, vertices // (20 * CTOS_POR_ROTA * pops))  # Pastas de rota com CTO's em cada POP
+
+    abrir = gzip.open if saida.endswith(".gz") else open
+    proxima = iter(pontos_rotas)
+    with abrir(saida, "wt", encoding="utf-8") as arquivo:
+        arquivo.write(CABECALHO)
+
+        for i, quantidade_pasta in enumerate(dividir(rotas_link, pastas_link)):
+            centro = (-5.09 + rng.uniform(-2, 2), -42.80 + rng.uniform(-2, 2))
+            arquivo.write(f"<Folder><name>LINK {i}</name>\n")
+            for subpasta, estilo, quantidade in zip(("EM ANDAMENTO", "CONCLUÍDO", "TRECHOS"), ("andamento", "concluido", None), dividir(quantidade_pasta, 3)):
+                arquivo.write(f"<Folder><name>{subpasta}</name>\n")
+                for j in range(quantidade):
+                    arquivo.write(placemark_rota(rng, f"ROTA {i}-{subpasta[0]}{j}", next(proxima), centro, estilo))
+                arquivo.write("</Folder>\n")
+            arquivo.write("</Folder>\n")
+
+        arquivo.write("<Folder><name>LINK PARCEIROS</name>\n")
+        for j in range(rotas_parceiros):
+            arquivo.write(placemark_rota(rng, f"PARCEIRO {j}", next(proxima), centros_pops[j % pops]))
+        arquivo.write("</Folder>\n")
+
+        arquivo.write("<Folder><name>CIDADES</name>\n")
+        for i in range(pastas_link + 1):
+            arquivo.write(placemark_ponto(rng, f"CIDADE {i}", centros_pops[i % pops]))
+        arquivo.write("</Folder>\n")
+
+        arquivo.write("<Folder><name>REDE GPON</name>\n")
+        for p, quantidade_pop in enumerate(dividir(rotas_gpon, pops)):
+            arquivo.write(f"<Folder><name>POP {p}</name>\n")
+            for j in range(quantidade_pop):
+                arquivo.write(placemark_rota(rng, f"FIBRA {p}-{j}", next(proxima), centros_pops[p]))
+            for projeto, quantidade_rotas in enumerate(dividir(rotas_ctos, 2)):
+                arquivo.write(f"<Folder><name>CTO'S PROJ {p}-{projeto}</name>\n")
+                for r in range(quantidade_rotas):
+                    arquivo.write(f"<Folder><name>ROTA {r}</name>\n")
+                    for c in range(CTOS_POR_ROTA):
+                        arquivo.write(placemark_ponto(rng, f"CTO {p}-{projeto}-{r}-{c}", centros_pops[p]))
+                    arquivo.write("</Folder>\n")
+                arquivo.write("</Folder>\n")
+            arquivo.write("</Folder>\n")
+        arquivo.write("</Folder>\n")
+
+        arquivo.write("</Document>\n</kml>\n")
+
+    return rotas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um arquivo KML sintético com as convenções de pastas do aplicativo.")
+    parser.add_argument("saida", help="arquivo gerado (.kml ou .kml.gz)")
+    parser.add_argument("vertices", nargs="?", type=int, default=100_000, help="total de pontos das LineStrings (padrão: 100000)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do gerador aleatório (padrão: 0)")
+    parser.add_argument("--pontos-por-rota", type=int, default=PONTOS_POR_ROTA, help=f"pontos por LineString (padrão: {PONTOS_POR_ROTA})")
+    argumentos = parser.parse_args()
+
+    rotas = gerar_kml(argumentos.saida, argumentos.vertices, argumentos.semente, argumentos.pontos_por_rota)
+    print(f"{argumentos.saida}: {argumentos.vertices} vértices em {rotas} rotas")
+
+
+if __name__ == "__main__":
+    main()
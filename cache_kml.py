@@ -0,0 +1,131 @@
+# Cache dos resultados do processamento de KML.
+#
+# A chave combina o hash SHA-256 do arquivo enviado com as configurações de
+# processamento (modo de distância, modo em fluxo, ...). Há dois níveis:
+#   - memória: LRU com número máximo de itens, compartilhado entre sessões;
+#   - disco (opcional): arquivos pickle em um diretório, nomeados pelo hash da
+#     chave, com remoção dos itens usados há mais tempo quando o tamanho total
+#     passa do limite.
+#
+# Configuração por variáveis de ambiente:
+#   KML_CACHE_ITENS     quantidade de resultados mantidos em memória (padrão 8)
+#   KML_CACHE_DIR       diretório do cache em disco (desativado se vazio)
+#   KML_CACHE_DISCO_MB  tamanho máximo do cache em disco em MB (padrão 1024)
+#
+# Os valores guardados são compartilhados entre sessões e devem ser tratados
+# como somente leitura.
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Versão do formato dos resultados; incrementar quando o formato mudar
+VERSAO_RESULTADOS = 14
+
+
+# Função para calcular o hash SHA-256 do conteúdo enviado
+def calcular_hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class CacheResultados:
+    def __init__(self, max_itens=8, diretorio=None, max_bytes_disco=1024 * 1024 * 1024):
+        self.max_itens = max_itens
+        self.diretorio = diretorio
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    # Monta a chave a partir do hash do arquivo e das configurações de processamento
+    def chave(self, hash_conteudo, **configuracoes):
+        configuracoes["versao"] = VERSAO_RESULTADOS
+        texto = hash_conteudo + json.dumps(configuracoes, sort_keys=True)
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    # O nome do arquivo é o hash da chave: chaves compostas (como as dos mapas, com o nome
+    # do POP) podem ter "/" ou caracteres que o Windows não aceita em nomes de arquivo
+    def _caminho(self, chave):
+        nome = hashlib.sha256(chave.encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio, f"{nome}.pkl")
+
+    def obter(self, chave):
+        with self._trava:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+
+        if not self.diretorio:
+            return None
+
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as arquivo:
+                valor = pickle.load(arquivo)
+            os.utime(caminho)  # Marca o item como usado recentemente
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        self._guardar_memoria(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._guardar_memoria(chave, valor)
+        if self.diretorio:
+            self._guardar_disco(chave, valor)
+
+    def _guardar_memoria(self, chave, valor):
+        with self._trava:
+            self._memoria[chave] = valor
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_itens:
+                self._memoria.popitem(last=False)
+
+    def _guardar_disco(self, chave, valor):
+        # Grava em arquivo temporário e renomeia, para não deixar itens incompletos
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with os.fdopen(descritor, "wb") as arquivo:
+                pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, self._caminho(chave))
+        except OSError:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        self._limitar_disco()
+
+    # Remove os itens usados há mais tempo até o cache em disco caber no limite
+    def _limitar_disco(self):
+        itens = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".pkl"):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            itens.append((estado.st_mtime, estado.st_size, caminho))
+
+        tamanho_total = sum(tamanho for _, tamanho, _ in itens)
+        for _, tamanho, caminho in sorted(itens):
+            if tamanho_total <= self.max_bytes_disco:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            tamanho_total -= tamanho
+
+
+# Função para criar o cache com a configuração das variáveis de ambiente
+def criar_cache_resultados():
+    return CacheResultados(
+        max_itens=int(os.environ.get("KML_CACHE_ITENS", "8")),
+        diretorio=os.environ.get("KML_CACHE_DIR") or None,
+        max_bytes_disco=int(os.environ.get("KML_CACHE_DISCO_MB", "1024")) * 1024 * 1024,
+    )
@@ -0,0 +1,92 @@
+# Instrumentação das etapas do processamento e das seções do painel.
+#
+# Cada etapa registra o tempo decorrido e, com memoria=True, o pico de memória
+# alocada pelo Python durante a etapa (tracemalloc, ligado só enquanto a etapa
+# roda). Os processos da extração em paralelo ficam fora da medição de memória.
+# As etapas não devem ser aninhadas: o pico de uma etapa interna zeraria o da
+# externa.
+#
+# Cada etapa também gera uma linha de log estruturada (chave=valor) no nível
+# INFO do logger "projetos_kml", por exemplo:
+#   etapa=distancias segundos=0.412 pico_mb=35.2 arquivo=rede.kmz bytes=1048576
+# Com KML_LOG_NIVEL=INFO as linhas aparecem na saída de erro do servidor, o que
+# permite diagnosticar arquivos lentos em produção.
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Logger do aplicativo; o nível vem da variável KML_LOG_NIVEL (padrão WARNING, use DEBUG para depurar)
+logger = logging.getLogger("projetos_kml")
+logger.setLevel(os.environ.get("KML_LOG_NIVEL", "WARNING").upper())
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+
+
+# Função para formatar um registro como linha chave=valor; textos com espaços ou aspas vão entre aspas
+def linha_log(registro):
+    partes = []
+    for chave, valor in registro.items():
+        if valor is None:
+            continue
+        if isinstance(valor, float):
+            valor = f"{valor:.4f}"
+        elif isinstance(valor, str) and (not valor or any(caractere in valor for caractere in " \"=")):
+            valor = json.dumps(valor, ensure_ascii=False)
+        partes.append(f"{chave}={valor}")
+    return " ".join(partes)
+
+
+class Diagnostico:
+    # "contexto" (por exemplo, o nome e o tamanho do arquivo) é repetido em todas as linhas de log
+    def __init__(self, memoria=False, **contexto):
+        self.memoria = memoria
+        self.contexto = contexto
+        self.etapas = []  # {"etapa", "segundos", "pico_mb", "erro"}, na ordem de execução
+
+    # Mede o bloco "with" como a etapa "nome"; uma exceção é registrada e propagada
+    @contextmanager
+    def etapa(self, nome):
+        iniciou_tracemalloc = False
+        if self.memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                iniciou_tracemalloc = True
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+
+        erro = None
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            pico_mb = None
+            if self.memoria:
+                pico_mb = (tracemalloc.get_traced_memory()[1] - memoria_inicial) / (1024 * 1024)
+                if iniciou_tracemalloc:
+                    tracemalloc.stop()
+            self.registrar(nome, segundos, pico_mb, erro)
+
+    def registrar(self, nome, segundos, pico_mb=None, erro=None):
+        registro = {"etapa": nome, "segundos": segundos, "pico_mb": pico_mb, "erro": erro}
+        self.etapas.append(registro)
+        logger.info(linha_log({**registro, **self.contexto}))
+
+    # Tempo total das etapas registradas, em segundos
+    def total(self):
+        return sum(registro["segundos"] for registro in self.etapas)
+
+
+# Função para medir uma etapa quando houver diagnóstico (sem diagnóstico, não mede nada)
+def medir_etapa(diagnostico, nome):
+    if diagnostico is None:
+        return nullcontext()
+    return diagnostico.etapa(nome)
@@ -0,0 +1,97 @@
+# Extração em paralelo: leitura e medição das LineStrings em vários processos.
+#
+# A indexação do KML é sequencial (é a própria leitura do XML), mas depois
+# dela as rotas de cada pasta LINK e de cada POP GPON são independentes. Os
+# textos dos blocos <coordinates> são divididos em blocos contíguos de tamanho
+# parecido e enviados a um ProcessPoolExecutor; cada processo lê e mede as
+# rotas do seu bloco e devolve apenas arrays NumPy. Os blocos são juntados na
+# ordem em que foram enviados, então o resultado não depende da ordem em que
+# os processos terminam.
+#
+# As funções executadas nos processos ficam neste módulo, e não no script do
+# Streamlit, para que os processos filhos possam importá-las.
+#
+# Configuração por variáveis de ambiente:
+#   KML_TRABALHADORES   quantidade de processos (padrão: número de CPUs)
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from distancias import MODO_PADRAO, calcular_distancias_lote
+from rotas import ArmazemCoordenadas, ler_coordenadas
+
+# Abaixo deste total de texto de coordenadas, a medição é feita no próprio processo
+LIMITE_PARALELO_BYTES = 8 * 1024 * 1024
+
+# Blocos enviados por processo, para equilibrar a carga entre eles
+BLOCOS_POR_TRABALHADOR = 4
+
+
+# Função para obter a quantidade padrão de processos
+def trabalhadores_padrao():
+    return max(1, int(os.environ.get("KML_TRABALHADORES") or os.cpu_count() or 1))
+
+
+# Função executada nos processos: lê e mede um bloco de rotas.
+# Retorna as coordenadas concatenadas, a quantidade de pontos de cada rota,
+# as distâncias por segmento e a distância total de cada rota.
+def medir_bloco(textos, modo_distancia=MODO_PADRAO, tipo_coordenadas=np.float64):
+    rotas = [ler_coordenadas(texto) for texto in textos]
+    contagens = np.array([len(rota) for rota in rotas], dtype=np.int64)
+    if rotas:
+        coordenadas = np.concatenate(rotas).astype(tipo_coordenadas)
+    else:
+        coordenadas = np.zeros((0, 2), dtype=tipo_coordenadas)
+
+    # As distâncias são medidas sobre as coordenadas já no tipo do armazém, como na extração serial
+    segmentos, totais = calcular_distancias_lote(coordenadas, np.cumsum(contagens) - contagens, modo_distancia)
+    return coordenadas, contagens, segmentos, totais
+
+
+# Função para dividir as rotas em blocos contíguos com quantidades parecidas de texto
+# Retorna a lista de intervalos (início, fim) de índices de rotas
+def dividir_blocos(textos, quantidade):
+    tamanhos = np.cumsum([len(texto) for texto in textos])
+    cortes = np.searchsorted(tamanhos, tamanhos[-1] * np.arange(1, quantidade) / quantidade) + 1
+    limites = np.unique(np.concatenate(([0], np.minimum(cortes, len(textos)), [len(textos)])))
+    return [(int(inicio), int(fim)) for inicio, fim in zip(limites[:-1], limites[1:])]
+
+
+# Função para ler e medir todas as rotas de um TextosCoordenadas, em paralelo quando valer a pena.
+# Retorna o ArmazemCoordenadas com as rotas, as distâncias por segmento e a distância total de
+# cada rota, no mesmo formato de calcular_distancias_lote sobre o armazém completo.
+def medir_textos(textos, modo_distancia=MODO_PADRAO, trabalhadores=None):
+    trabalhadores = trabalhadores or trabalhadores_padrao()
+    tamanho_total = sum(len(texto) for texto in textos.textos)
+
+    if trabalhadores <= 1 or len(textos) < 2 or tamanho_total < LIMITE_PARALELO_BYTES:
+        # Arquivos pequenos: o custo de iniciar os processos não compensa
+        resultados = [medir_bloco(textos.textos, modo_distancia, textos.tipo)]
+    else:
+        blocos = dividir_blocos(textos.textos, trabalhadores * BLOCOS_POR_TRABALHADOR)
+        contexto = multiprocessing.get_context("spawn")  # Seguro com as threads do Streamlit
+        with ProcessPoolExecutor(max_workers=trabalhadores, mp_context=contexto) as executor:
+            futuros = [
+                executor.submit(medir_bloco, textos.textos[inicio:fim], modo_distancia, textos.tipo)
+                for inicio, fim in blocos
+            ]
+            resultados = [futuro.result() for futuro in futuros]
+
+    # Junta os blocos na ordem de envio; o segmento entre dois blocos liga rotas diferentes e vale zero
+    segmentos = []
+    for coordenadas, _, segmentos_bloco, _ in resultados:
+        if len(coordenadas) == 0:
+            continue
+        if segmentos:
+            segmentos.append(np.zeros(1))
+        segmentos.append(segmentos_bloco)
+
+    armazem = ArmazemCoordenadas(textos.tipo).carregar(
+        np.concatenate([resultado[0] for resultado in resultados]),
+        np.concatenate([resultado[1] for resultado in resultados])
+    )
+    segmentos = np.concatenate(segmentos) if segmentos else np.zeros(0)
+    totais = np.concatenate([resultado[3] for resultado in resultados])
+    return armazem, segmentos, totais
@@ -0,0 +1,212 @@
+# Processamento em lote dos arquivos KML pela linha de comando, sem o Streamlit.
+#
+# Uso:
+#   python lote_kml.py ENTRADA [ENTRADA ...] [-s SAIDA] [-f csv|parquet]
+#                      [-m MODO] [-p PROCESSOS] [--streaming]
+#
+# Cada ENTRADA é um diretório (todos os .kml, .kmz e .kml.gz dele) ou um padrão
+# glob ("regionais/**/*.kmz"). Os arquivos são distribuídos entre os processos
+# de um ProcessPoolExecutor, um arquivo por vez em cada processo, e cada
+# arquivo é processado pelo mesmo núcleo do aplicativo (analise_kml).
+#
+# Relatórios gravados em SAIDA (padrão "relatorios"):
+#   arquivos/<nome>_rotas, arquivos/<nome>_gpon   tabelas de cada arquivo
+#   rotas, gpon                                   tabelas consolidadas, com a coluna "Arquivo"
+#   tempos                                        tempo de processamento (total e por etapa), rotas
+#                                                 e distância total de cada arquivo, ou o erro encontrado
+# O tempo de cada arquivo também é exibido à medida que os processos terminam.
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from lxml import etree
+
+from analise_kml import processar_arquivo_kml
+from diagnostico import Diagnostico
+from distancias import MODO_PADRAO, MODOS_DISTANCIA
+from extracao_paralela import trabalhadores_padrao
+
+# Extensões dos arquivos procurados nos diretórios de entrada
+EXTENSOES_LOTE = (".kml", ".kmz", ".kml.gz")
+
+FORMATOS_SAIDA = ["csv", "parquet"]
+
+
+# Função para listar os arquivos das entradas (diretórios ou padrões glob), sem repetições
+def listar_arquivos(entradas):
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            encontrados = [
+                os.path.join(entrada, nome) for nome in os.listdir(entrada)
+                if nome.lower().endswith(EXTENSOES_LOTE) and os.path.isfile(os.path.join(entrada, nome))
+            ]
+        else:
+            encontrados = [caminho for caminho in glob.glob(entrada, recursive=True) if os.path.isfile(caminho)]
+        arquivos.extend(sorted(encontrados))
+    return list(dict.fromkeys(arquivos))
+
+
+# Função para obter o nome do arquivo sem as extensões .kml, .kmz ou .kml.gz
+def nome_base(caminho):
+    nome = os.path.basename(caminho)
+    for extensao in sorted(EXTENSOES_LOTE, key=len, reverse=True):
+        if nome.lower().endswith(extensao):
+            return nome[:-len(extensao)]
+    return nome
+
+
+# Função executada nos processos: processa um arquivo e mede o tempo gasto, no total e por etapa.
+# Retorna apenas as tabelas de rotas e GPON e os totais, que são pequenos para
+# voltar ao processo principal; em caso de erro, a mensagem fica em "erro".
+def processar_arquivo(caminho, modo_distancia=MODO_PADRAO, streaming=False):
+    diagnostico = Diagnostico(arquivo=caminho)
+    inicio = time.perf_counter()
+    try:
+        resultados = processar_arquivo_kml(caminho, modo_distancia, streaming=streaming, diagnostico=diagnostico)
+    except etree.XMLSyntaxError as e:
+        linha, coluna = e.position
+        erro = f"Erro de sintaxe no arquivo KML (linha {linha}, coluna {coluna}): {e.msg}"
+        return {"arquivo": caminho, "segundos": time.perf_counter() - inicio, "etapas": diagnostico.etapas, "erro": erro}
+    except (zipfile.BadZipFile, OSError, EOFError, ValueError) as e:
+        erro = f"Não foi possível ler o arquivo: {e}"
+        return {"arquivo": caminho, "segundos": time.perf_counter() - inicio, "etapas": diagnostico.etapas, "erro": erro}
+    except Exception as e:
+        # Qualquer outro erro fica registrado no relatório, sem interromper o lote
+        erro = f"Erro ao processar o arquivo ({type(e).__name__}): {e}"
+        return {"arquivo": caminho, "segundos": time.perf_counter() - inicio, "etapas": diagnostico.etapas, "erro": erro}
+
+    return {
+        "arquivo": caminho,
+        "segundos": time.perf_counter() - inicio,
+        "etapas": diagnostico.etapas,
+        "erro": None,
+        "distancia_total": resultados.distancia_total,
+        "rotas": resultados.registros_rotas,
+        "gpon": resultados.tabela_gpon.reset_index(),
+    }
+
+
+# Função para processar os arquivos em "processos" processos (1 = no próprio processo).
+# "ao_terminar" é chamada com o resultado de cada arquivo assim que ele termina.
+# Retorna os resultados na ordem dos arquivos.
+def processar_lote(arquivos, modo_distancia=MODO_PADRAO, streaming=False, processos=1, ao_terminar=None):
+    resultados = {}
+    if processos <= 1 or len(arquivos) < 2:
+        for caminho in arquivos:
+            resultados[caminho] = processar_arquivo(caminho, modo_distancia, streaming)
+            if ao_terminar is not None:
+                ao_terminar(resultados[caminho])
+    else:
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(processos, len(arquivos)), mp_context=contexto) as executor:
+            futuros = [executor.submit(processar_arquivo, caminho, modo_distancia, streaming) for caminho in arquivos]
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                resultados[resultado["arquivo"]] = resultado
+                if ao_terminar is not None:
+                    ao_terminar(resultado)
+
+    return [resultados[caminho] for caminho in arquivos]
+
+
+# Função para gravar uma tabela no formato escolhido; "caminho" não tem a extensão
+def salvar_tabela(tabela, caminho, formato="csv"):
+    if formato == "parquet":
+        tabela.to_parquet(f"{caminho}.parquet", index=False)
+    else:
+        tabela.to_csv(f"{caminho}.csv", index=False)
+
+
+# Função para gravar as tabelas de cada arquivo, as consolidadas e o relatório de tempos
+def salvar_relatorios(resultados, saida, formato="csv"):
+    pasta_arquivos = os.path.join(saida, "arquivos")
+    os.makedirs(pasta_arquivos, exist_ok=True)
+
+    nomes = set()
+    tabelas_rotas = []
+    tabelas_gpon = []
+    tempos = []
+    for resultado in resultados:
+        # Arquivos com o mesmo nome em diretórios diferentes recebem um sufixo
+        nome = base = nome_base(resultado["arquivo"])
+        contador = 2
+        while nome in nomes:
+            nome = f"{base}_{contador}"
+            contador += 1
+        nomes.add(nome)
+
+        tempos.append({
+            "Arquivo": resultado["arquivo"],
+            "Relatório": nome,
+            "Tempo (s)": round(resultado["segundos"], 3),
+            "Rotas": len(resultado["rotas"]) if resultado["erro"] is None else None,
+            "Distância total (m)": resultado["distancia_total"] if resultado["erro"] is None else None,
+            "Erro": resultado["erro"],
+            **{f"{registro['etapa']} (s)": round(registro["segundos"], 3) for registro in resultado["etapas"]},
+        })
+        if resultado["erro"] is not None:
+            continue
+
+        salvar_tabela(resultado["rotas"], os.path.join(pasta_arquivos, f"{nome}_rotas"), formato)
+        salvar_tabela(resultado["gpon"], os.path.join(pasta_arquivos, f"{nome}_gpon"), formato)
+        tabelas_rotas.append(resultado["rotas"].assign(Arquivo=resultado["arquivo"]))
+        tabelas_gpon.append(resultado["gpon"].assign(Arquivo=resultado["arquivo"]))
+
+    # Tabelas consolidadas, com o arquivo de origem na primeira coluna
+    for nome, tabelas in (("rotas", tabelas_rotas), ("gpon", tabelas_gpon)):
+        if tabelas:
+            consolidada = pd.concat(tabelas, ignore_index=True)
+            consolidada = consolidada[["Arquivo"] + [coluna for coluna in consolidada.columns if coluna != "Arquivo"]]
+            salvar_tabela(consolidada, os.path.join(saida, nome), formato)
+    tempos = pd.DataFrame(tempos)
+    tempos["Rotas"] = tempos["Rotas"].astype("Int64")  # Vazio nos arquivos com erro
+    salvar_tabela(tempos, os.path.join(saida, "tempos"), formato)
+
+
+# Função para exibir o tempo de um arquivo assim que ele termina
+def exibir_tempo(resultado):
+    if resultado["erro"] is not None:
+        print(f"{resultado['arquivo']}: ERRO após {resultado['segundos']:.2f} s - {resultado['erro']}", flush=True)
+    else:
+        print(
+            f"{resultado['arquivo']}: {resultado['segundos']:.2f} s, {len(resultado['rotas'])} rotas, "
+            f"{resultado['distancia_total']:.0f} m",
+            flush=True
+        )
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Processa arquivos KML, KMZ e .kml.gz em lote e grava as tabelas de rotas e GPON.")
+    parser.add_argument("entradas", nargs="+", help="diretórios ou padrões glob dos arquivos")
+    parser.add_argument("-s", "--saida", default="relatorios", help="diretório dos relatórios (padrão: relatorios)")
+    parser.add_argument("-f", "--formato", choices=FORMATOS_SAIDA, default="csv", help="formato das tabelas (padrão: csv)")
+    parser.add_argument("-m", "--modo", choices=list(MODOS_DISTANCIA), default=MODO_PADRAO, help=f"cálculo de distâncias (padrão: {MODO_PADRAO})")
+    parser.add_argument("-p", "--processos", type=int, default=trabalhadores_padrao(), help="processos em paralelo (padrão: KML_TRABALHADORES ou número de CPUs)")
+    parser.add_argument("--streaming", action="store_true", help="lê os arquivos em fluxo, com memória limitada")
+    argumentos = parser.parse_args(argumentos)
+
+    arquivos = listar_arquivos(argumentos.entradas)
+    if not arquivos:
+        parser.error("nenhum arquivo KML, KMZ ou .kml.gz encontrado nas entradas")
+
+    inicio = time.perf_counter()
+    resultados = processar_lote(arquivos, argumentos.modo, argumentos.streaming, argumentos.processos, exibir_tempo)
+    salvar_relatorios(resultados, argumentos.saida, argumentos.formato)
+
+    erros = sum(resultado["erro"] is not None for resultado in resultados)
+    print(
+        f"{len(arquivos)} arquivos em {time.perf_counter() - inicio:.2f} s ({erros} com erro); "
+        f"relatórios em {argumentos.saida}"
+    )
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# Mapas Folium do aplicativo: rotas (PolyLines ou camadas GeoJSON), cidades e CTO's.
+#
+# Cada função gera o HTML completo do mapa (o mesmo renderizado pelo
+# folium_static), que o aplicativo guarda no cache de resultados. O módulo é
+# importado pelo aplicativo apenas quando um mapa precisa ser gerado, para que
+# o folium não pese no carregamento da página inicial.
+import base64
+import mimetypes
+import os
+from functools import lru_cache
+
+import folium
+import numpy as np
+from folium.features import CustomIcon
+from folium.plugins import FastMarkerCluster
+
+from rotas import calcular_limites
+from simplificacao import douglas_peucker, tolerancia_zoom, zoom_limites
+
+# Zoom inicial do mapa quando não há retângulo envolvente para enquadrar
+ZOOM_INICIAL = 5
+
+# Zoom máximo ao enquadrar o mapa (evita aproximar demais em áreas com um único ponto)
+ZOOM_MAXIMO = 16
+
+# Função para criar o mapa Folium base, enquadrado no retângulo envolvente quando houver
+# Retorna o mapa e o zoom em que ele abre, que define a tolerância da simplificação das rotas
+def criar_mapa_base(limites=None, **opcoes):
+    if limites is None:
+        mapa = folium.Map(location=[-5.0892, -42.8016], zoom_start=ZOOM_INICIAL, tiles="Esri WorldImagery", **opcoes)
+        return mapa, ZOOM_INICIAL
+
+    (lat_min, lon_min), (lat_max, lon_max) = limites
+    zoom = min(zoom_limites(limites), ZOOM_MAXIMO)
+    mapa = folium.Map(location=[(lat_min + lat_max) / 2, (lon_min + lon_max) / 2], zoom_start=zoom, tiles="Esri WorldImagery", **opcoes)
+    mapa.fit_bounds(limites, max_zoom=ZOOM_MAXIMO)
+    return mapa, zoom
+
+# Função para adicionar uma PolyLine (simples ou múltipla) ao mapa com o estilo da rota
+def adicionar_linha_mapa(mapa, coordenadas, cor, estilo, tooltip):
+    # Define o estilo da linha
+    if estilo == "dashed":
+        dash_array = "7, 7"  # Tracejado mais perceptível
+        weight = 4  # Espessura maior para destacar
+        opacity = 1.0  # Opacidade total (sem linha de fundo)
+    else:
+        dash_array = None  # Linha sólida
+        weight = 4  # Espessura padrão
+        opacity = 1.0  # Opacidade padrão
+
+    # Adiciona a LineString ao mapa
+    folium.PolyLine(
+        coordenadas,
+        color=cor,  # Cor da linha
+        weight=weight,  # Espessura da linha
+        opacity=opacity,  # Opacidade da linha
+        dash_array=dash_array,  # Aplica o tracejado apenas para "EM ANDAMENTO"
+        tooltip=tooltip
+    ).add_to(mapa)
+
+# Função para criar o mapa Folium com as rotas e as cidades e gerar o seu HTML
+# As distâncias exibidas são as medidas na extração (rota.distancia), sobre a geometria completa.
+# Sem detalhe_completo, as rotas são simplificadas para o zoom inicial e as rotas de uma
+# mesma pasta com a mesma cor e estilo viram uma única PolyLine múltipla.
+# "limites" é o retângulo envolvente em que o mapa é enquadrado ao abrir.
+def criar_mapa_html(coordenadas_por_pasta, cidades_coords, detalhe_completo=False, limites=None, icone_cidades=None):
+    # Cria o mapa Folium
+    mapa, zoom = criar_mapa_base(limites)
+
+    # Adiciona LineStrings e marcadores ao mapa
+    tolerancia = tolerancia_zoom(zoom)
+    for nome_folder, coordenadas_folder in coordenadas_por_pasta.items():
+        coordenadas_folder = [rota for rota in coordenadas_folder if len(rota.coordenadas)]  # Rotas sem pontos não são desenhadas
+        if detalhe_completo:
+            for rota in coordenadas_folder:
+                adicionar_linha_mapa(
+                    mapa, rota.coordenadas.tolist(), rota.cor, rota.estilo,
+                    f"{nome_folder} - {rota.nome} | Distância: {rota.distancia} metros"
+                )
+            continue
+
+        # Agrupa as rotas da pasta por estilo (cor e tracejado)
+        grupos = {}
+        for rota in coordenadas_folder:
+            grupos.setdefault((rota.cor, rota.estilo), []).append(rota)
+
+        for (cor, estilo), rotas in grupos.items():
+            linhas = [douglas_peucker(rota.coordenadas, tolerancia).tolist() for rota in rotas]
+            distancia = sum(rota.distancia for rota in rotas)
+            if len(rotas) == 1:
+                tooltip = f"{nome_folder} - {rotas[0].nome} | Distância: {distancia} metros"
+            else:
+                tooltip = f"{nome_folder} - {len(rotas)} rotas | Distância: {distancia} metros"
+            adicionar_linha_mapa(mapa, linhas, cor, estilo, tooltip)
+
+    adicionar_cidades_mapa(mapa, cidades_coords, icone_cidades)
+
+    # Gera o HTML do mapa (o mesmo renderizado pelo folium_static)
+    return folium.Figure().add_child(mapa).render()
+
+# Camadas do mapa GeoJSON, na ordem de exibição no controle de camadas
+CAMADAS_MAPA = ["LINK", "LINK PARCEIROS", "EM ANDAMENTO", "CONCLUÍDO"]
+
+# Função para definir a camada do mapa de uma rota
+def camada_rota(rota):
+    if rota.parceiros:
+        return "LINK PARCEIROS"
+    if rota.status == "em_andamento":
+        return "EM ANDAMENTO"
+    if rota.status == "concluido":
+        return "CONCLUÍDO"
+    return "LINK"
+
+# Função para definir o estilo de uma feição GeoJSON a partir das propriedades cor e tracejado
+def estilo_feicao(feicao):
+    return {
+        "color": feicao["properties"]["cor"],
+        "weight": 4,
+        "opacity": 1.0,
+        "dashArray": "7, 7" if feicao["properties"]["estilo"] == "dashed" else None,
+    }
+
+# Função para criar o mapa com as rotas em camadas GeoJSON e gerar o seu HTML.
+# Cada camada (LINK, LINK PARCEIROS, EM ANDAMENTO, CONCLUÍDO) é uma única
+# FeatureCollection, que o navegador desenha de uma vez e pode ser ligada e
+# desligada no controle de camadas. Sem detalhe_completo, as rotas também são
+# simplificadas para o zoom inicial.
+def criar_mapa_geojson_html(coordenadas_por_pasta, cidades_coords, detalhe_completo=False, limites=None, icone_cidades=None):
+    mapa, zoom = criar_mapa_base(limites)
+
+    # Monta as feições de cada camada; o GeoJSON usa a ordem (longitude, latitude)
+    tolerancia = tolerancia_zoom(zoom)
+    camadas = {camada: [] for camada in CAMADAS_MAPA}
+    for nome_folder, coordenadas_folder in coordenadas_por_pasta.items():
+        for rota in coordenadas_folder:
+            if not len(rota.coordenadas):
+                continue  # Rotas sem pontos não são desenhadas
+            coordenadas = rota.coordenadas if detalhe_completo else douglas_peucker(rota.coordenadas, tolerancia)
+            camadas[camada_rota(rota)].append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": np.round(coordenadas[:, ::-1], 6).tolist()},
+                "properties": {
+                    "pasta": nome_folder,
+                    "nome": rota.nome,
+                    "distancia": rota.distancia,
+                    "cor": rota.cor,
+                    "estilo": rota.estilo,
+                },
+            })
+
+    for camada, feicoes in camadas.items():
+        if not feicoes:
+            continue
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": feicoes},
+            name=camada,
+            style_function=estilo_feicao,
+            tooltip=folium.GeoJsonTooltip(
+                fields=["pasta", "nome", "distancia"],
+                aliases=["Pasta", "Rota", "Distância (metros)"]
+            )
+        ).add_to(mapa)
+
+    adicionar_cidades_mapa(mapa, cidades_coords, icone_cidades)
+    folium.LayerControl(collapsed=False).add_to(mapa)
+
+    return folium.Figure().add_child(mapa).render()
+
+# Código JavaScript que cria o marcador de cada CTO (círculo desenhado no canvas, sem ícone)
+MARCADOR_CTO_JS = """function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 5, color: "#ff7f00", weight: 1, fillOpacity: 0.9});
+    marker.bindTooltip(row[2]);
+    return marker;
+}"""
+
+# Função para criar o mapa das CTO's (todas ou apenas as do POP selecionado) e gerar o seu HTML.
+# Os marcadores são criados no navegador e agrupados em clusters, o que mantém o mapa
+# responsivo mesmo com dezenas de milhares de pontos.
+def criar_mapa_ctos_html(dados_gpon, pop_selecionado="TODAS"):
+    pontos = []
+    limites_pops = []  # Retângulos envolventes dos POPs exibidos, calculados na extração
+    for nome_gpon, dados in dados_gpon.items():
+        for subpasta in dados["primeiro_nivel"]:
+            if pop_selecionado != "TODAS" and subpasta["nome"] != pop_selecionado:
+                continue
+            if subpasta["limites"] is not None:
+                limites_pops.append(subpasta["limites"])
+            for cto in subpasta["ctos"]:
+                for rota in cto["rotas"]:
+                    pontos.extend(rota["pontos"])
+
+    mapa, _ = criar_mapa_base(calcular_limites(*limites_pops), prefer_canvas=True)
+    if pontos:
+        FastMarkerCluster(pontos, callback=MARCADOR_CTO_JS, name="CTO'S", chunkedLoading=True).add_to(mapa)
+
+    return folium.Figure().add_child(mapa).render()
+
+# Função para adicionar os marcadores das cidades ao mapa
+# Todas as cidades ficam em uma única camada GeoJSON, e o ícone (em data URI) é definido uma só vez
+# "icone" é o ícone das cidades guardado no KMZ, quando houver; senão é usado o ícone local
+def adicionar_cidades_mapa(mapa, cidades_coords, icone=None):
+    if not cidades_coords:
+        return
+
+    cidades = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [coords[1], coords[0]]},
+                "properties": {"nome": nome_cidade},
+            }
+            for nome_cidade, coords in cidades_coords
+        ],
+    }
+
+    # Adiciona marcadores das cidades ao mapa com ícone personalizado
+    if icone is not None:
+        casa_icon = CustomIcon(icon_image=icone, icon_size=(32, 32))  # Ícone do KMZ, embutido no HTML
+    else:
+        casa_icon = CustomIcon(
+            icon_image=carregar_icone_cidade(),  # Ícone local, embutido no HTML
+            icon_size=(40, 20)  # Tamanho do ícone (largura, altura)
+        )
+    folium.GeoJson(
+        cidades,
+        name="CIDADES",
+        marker=folium.Marker(icon=casa_icon),  # Usa o ícone personalizado
+        tooltip=folium.GeoJsonTooltip(fields=["nome"], labels=False)
+    ).add_to(mapa)
+
+# Ícone das cidades; pode ser trocado (por exemplo, pelo logotipo da empresa) com a variável KML_ICONE_CIDADE
+ICONE_CIDADE = os.environ.get("KML_ICONE_CIDADE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "icone_cidade.svg")
+
+# Função para carregar o ícone das cidades como data URI, lido do disco uma única vez
+@lru_cache(maxsize=None)
+def carregar_icone_cidade(caminho=ICONE_CIDADE):
+    tipo = mimetypes.guess_type(caminho)[0] or "image/png"
+    with open(caminho, "rb") as arquivo:
+        return f"data:{tipo};base64,{base64.b64encode(arquivo.read()).decode('ascii')}"
@@ -1,320 +1,62 @@
+import os
+import zipfile
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import folium_static
-from pykml import parser
-from geopy.distance import geodesic
-import plotly.express as px
-from folium.features import CustomIcon
-from folium import Icon
-from lxml import etree
-
-def validar_kml(caminho_arquivo):
+import numpy as np
+from extracao_paralela import trabalhadores_padrao
+from arquivos_kml import EXTENSOES_KML, abrir_kml
+from cache_kml import calcular_hash_conteudo, criar_cache_resultados
+from distancias import MODO_PADRAO, MODOS_DISTANCIA
+from diagnostico import Diagnostico
+
+# As dependências pesadas (pandas, lxml/pykml, plotly e folium) só são importadas
+# quando a seção que as usa é exibida pela primeira vez, para que a página inicial
+# (antes do upload) carregue rápido; veja benchmarks/bench_importacao.py
+
+# Função para validar e carregar o KML com uma única análise do arquivo
+# Aceita um caminho ou um objeto de arquivo binário (por exemplo, o upload do Streamlit)
+# Retorna o elemento raiz, compartilhado pela extração e pelos gráficos, ou None se o arquivo for inválido
+def validar_kml(fonte):
+    from lxml import etree
+    from pykml import parser
+
     try:
-        with open(caminho_arquivo, "r", encoding="utf-8") as arquivo:
-            etree.parse(arquivo)
-        return True
+        if hasattr(fonte, "read"):
+            return parser.parse(fonte).getroot()
+        with open(fonte, "rb") as arquivo:
+            return parser.parse(arquivo).getroot()
     except etree.XMLSyntaxError as e:
-        st.error(f"Erro de sintaxe no arquivo KML: {e}")
-        return False
-
-
-
-# Função para calcular a distância total de uma LineString em metros
-def calcular_distancia_linestring(coordinates):
-    distancia_total = 0.0
-    for i in range(len(coordinates) - 1):
-        ponto_atual = coordinates[i]
-        proximo_ponto = coordinates[i + 1]
-        distancia_total += geodesic(ponto_atual, proximo_ponto).meters
-    return round(distancia_total, 0)  # Arredonda para 0 casas decimais
-
-# Função para extrair estilos do KML (LineStyle)
-def extrair_estilos(root):
-    estilos = {}
-    for estilo in root.findall(".//{http://www.opengis.net/kml/2.2}Style"):
-        style_id = estilo.get("id")
-        # Extrai cor do LineStyle
-        linestyle = estilo.find(".//{http://www.opengis.net/kml/2.2}LineStyle")
-        if linestyle is not None:
-            color_tag = linestyle.find(".//{http://www.opengis.net/kml/2.2}color")
-            if color_tag is not None:
-                kml_color = color_tag.text.strip()
-                color = f"#{kml_color[6:8]}{kml_color[4:6]}{kml_color[2:4]}"
-                estilos[style_id] = color
-    return estilos
-
-
-def processar_folder_link(folder, estilos):
-    # Verifica se a pasta está dentro de uma pasta "GPON"
-    parent = folder.getparent()
-    while parent is not None:
-        if hasattr(parent, 'name') and "GPON" in parent.name.text.upper():
-            return 0.0, [], [], [], [], False  # Retorna valores vazios se estiver dentro de uma pasta GPON
-        parent = parent.getparent()
-    
-    distancia_folder = 0.0
-    dados = []
-    coordenadas_folder = []
-    dados_em_andamento = []
-    dados_concluido = []
-    
-    # Verifica se o nome da pasta contém "LINK PARCEIROS"
-    nome_folder = folder.name.text if hasattr(folder, 'name') else "Desconhecido"
-    is_link_parceiros = "LINK PARCEIROS" in nome_folder.upper()
-    
-    # Define a cor com base no nome da pasta
-    if is_link_parceiros:
-        color = "red"  # Cor vermelha para "LINK PARCEIROS"
-    elif "AMARELO" in nome_folder.upper():
-        color = "yellow"
-    elif "VERDE" in nome_folder.upper():
-        color = "green"
-    else:
-        color = "blue"  # Cor padrão para "LINK"
-    
-    # Se for "LINK PARCEIROS", processa diretamente as LineString
-    if is_link_parceiros:
-        for placemark in folder.findall(".//{http://www.opengis.net/kml/2.2}Placemark"):
-            nome_placemark = placemark.name.text if hasattr(placemark, 'name') else "Sem Nome"
-            
-            for line_string in placemark.findall(".//{http://www.opengis.net/kml/2.2}LineString"):
-                coordinates = line_string.coordinates.text.strip().split()
-                coordinates = [tuple(map(float, coord.split(',')[:2][::-1])) for coord in coordinates]
-                
-                distancia = calcular_distancia_linestring(coordinates)
-                distancia_folder += distancia
-                
-                # Adiciona as informações às listas correspondentes
-                dados.append([nome_folder, nome_placemark, distancia])  # Inclui o nome da pasta
-                coordenadas_folder.append((nome_placemark, coordinates, color, "solid"))  # Sólido para "LINK PARCEIROS"
-        
-        return distancia_folder, dados, coordenadas_folder, [], [], is_link_parceiros
-    
-    # Caso contrário, processa como pasta "LINK" normal
-    for subfolder in folder.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-        subfolder_name = subfolder.name.text if hasattr(subfolder, 'name') else "Subpasta Desconhecida"
-        
-        # Verifica se a subpasta é "EM ANDAMENTO" ou "CONCLUÍDO"
-        is_em_andamento = "EM ANDAMENTO" in subfolder_name.upper()
-        is_concluido = "CONCLUÍDO" in subfolder_name.upper()
-        
-        # Processa as LineString dentro da subpasta
-        for placemark in subfolder.findall(".//{http://www.opengis.net/kml/2.2}Placemark"):
-            nome_placemark = placemark.name.text if hasattr(placemark, 'name') else "Sem Nome"
-            
-            # Usa a cor definida no estilo
-            style_url = placemark.find(".//{http://www.opengis.net/kml/2.2}styleUrl")
-            if style_url is not None:
-                style_id = style_url.text.strip().lstrip("#")
-                if style_id in estilos:
-                    color = estilos[style_id]
-            
-            for line_string in placemark.findall(".//{http://www.opengis.net/kml/2.2}LineString"):
-                coordinates = line_string.coordinates.text.strip().split()
-                coordinates = [tuple(map(float, coord.split(',')[:2][::-1])) for coord in coordinates]
-                
-                distancia = calcular_distancia_linestring(coordinates)
-                distancia_folder += distancia
-                
-                # Adiciona as informações às listas correspondentes
-                if is_em_andamento:
-                    dados_em_andamento.append([nome_folder, nome_placemark, distancia])
-                    coordenadas_folder.append((nome_placemark, coordinates, color, "dashed"))  # Tracejado para "EM ANDAMENTO"
-                elif is_concluido:
-                    dados_concluido.append([nome_folder, nome_placemark, distancia])
-                    coordenadas_folder.append((nome_placemark, coordinates, color, "solid"))  # Sólido para "CONCLUÍDO"
-                else:
-                    dados.append([nome_folder, nome_placemark, distancia])
-                    coordenadas_folder.append((nome_placemark, coordinates, color, "solid"))  # Sólido para outras pastas
-    
-    return distancia_folder, dados, coordenadas_folder, dados_em_andamento, dados_concluido, is_link_parceiros
+        exibir_erro_sintaxe(e)
+        return None
 
+# Função para exibir um erro de sintaxe do KML com a linha e a coluna
+def exibir_erro_sintaxe(erro):
+    linha, coluna = erro.position
+    st.error(f"Erro de sintaxe no arquivo KML (linha {linha}, coluna {coluna}): {erro.msg}")
 
+# Tamanho a partir do qual o modo em fluxo (iterparse) é sugerido por padrão
+LIMITE_STREAMING_BYTES = 50 * 1024 * 1024
 
-# Função para buscar recursivamente por pastas "CTO'S"
-def buscar_ctos(folder, ctos_processados=None):
-    if ctos_processados is None:
-        ctos_processados = set()  # Conjunto para rastrear pastas "CTO'S" já processadas
-    
-    ctos = []
-    
-    for subpasta in folder.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-        nome_subpasta = subpasta.name.text if hasattr(subpasta, 'name') else "Subpasta Desconhecida"
-        
-        # Se a subpasta contiver "CTO'S" no nome e ainda não foi processada
-        if "CTO'S" in nome_subpasta.upper() and nome_subpasta not in ctos_processados:
-            ctos_processados.add(nome_subpasta)  # Marca a pasta como processada
-            dados_cto = {"nome": nome_subpasta, "rotas": []}
-            
-            # Processa as rotas dentro da subpasta CTO'S
-            rotas = subpasta.findall(".//{http://www.opengis.net/kml/2.2}Folder")
-            for rota in rotas:
-                nome_rota = rota.name.text if hasattr(rota, 'name') else "Rota Desconhecida"
-                placemarks = rota.findall(".//{http://www.opengis.net/kml/2.2}Placemark")
-                dados_cto["rotas"].append({
-                    "nome_rota": nome_rota,
-                    "quantidade_placemarks": len(placemarks)
-                })
-            
-            ctos.append(dados_cto)
-        
-        # Busca recursivamente por mais pastas "CTO'S" dentro da subpasta atual
-        ctos.extend(buscar_ctos(subpasta, ctos_processados))
-    
-    return ctos
-
-# Função para processar pastas GPON e suas subpastas
-def processar_gpon(root):
-    dados_gpon = {}
-    
-    for folder in root.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-        nome_folder = folder.name.text if hasattr(folder, 'name') else "Desconhecido"
-        
-        # Verifica se o nome da pasta contém "GPON"
-        if "GPON" in nome_folder.upper():
-            dados_gpon[nome_folder] = {"primeiro_nivel": []}
-            
-            # Coleta todas as subpastas do primeiro nível após a pasta GPON
-            for subpasta in folder.findall("{http://www.opengis.net/kml/2.2}Folder"):
-                nome_subpasta = subpasta.name.text if hasattr(subpasta, 'name') else "Subpasta Desconhecida"
-                
-                # Dados da subpasta do primeiro nível
-                dados_subpasta = {"nome": nome_subpasta, "ctos": buscar_ctos(subpasta), "linestrings": []}
-                
-                # Processa as LineStrings dentro da subpasta
-                for placemark in subpasta.findall(".//{http://www.opengis.net/kml/2.2}Placemark"):
-                    for line_string in placemark.findall(".//{http://www.opengis.net/kml/2.2}LineString"):
-                        coordinates = line_string.coordinates.text.strip().split()
-                        coordinates = [tuple(map(float, coord.split(',')[:2][::-1])) for coord in coordinates]
-                        distancia = calcular_distancia_linestring(coordinates)
-                        dados_subpasta["linestrings"].append((placemark.name.text if hasattr(placemark, 'name') else "Sem Nome", distancia))
-                
-                # Adiciona a subpasta do primeiro nível aos dados da pasta GPON
-                dados_gpon[nome_folder]["primeiro_nivel"].append(dados_subpasta)
-    
-    return dados_gpon
-
-# Função para processar o KML e calcular distâncias
-def processar_kml(caminho_arquivo):
-    with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
-        root = parser.parse(arquivo).getroot()
-    
-    estilos = extrair_estilos(root)
-    distancia_total = 0.0
-    dados_por_pasta = {}
-    coordenadas_por_pasta = {}
-    cidades_coords = []
-    dados_em_andamento = []
-    dados_concluido = []
-    dados_link_parceiros = []
-    dados_gpon = {}
-
-    for folder in root.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-        nome_folder = folder.name.text if hasattr(folder, 'name') else "Desconhecido"
-
-        # Evitar duplicação: Verificar se a pasta já foi processada
-        if nome_folder in dados_por_pasta:
-            continue  # Se já processamos essa pasta, pulamos para a próxima
-
-        # Processa pastas LINK e LINK PARCEIROS
-        if "LINK" in nome_folder.upper():
-            distancia_folder, dados, coordenadas_folder, em_andamento, concluido, is_link_parceiros = processar_folder_link(folder, estilos)
-            distancia_total += distancia_folder
-
-            # Separa os dados dos "LINK PARCEIROS" dos dados da pasta "LINK"
-            if is_link_parceiros:
-                dados_link_parceiros.extend(dados)  # Adiciona sem sobrescrever
-                coordenadas_por_pasta.setdefault(nome_folder, []).extend(coordenadas_folder)
-            else:
-                # Adiciona apenas os dados gerais (não "EM ANDAMENTO" ou "CONCLUÍDO") ao dicionário
-                if nome_folder not in dados_por_pasta:
-                    dados_por_pasta[nome_folder] = (distancia_folder, [])
-                dados_por_pasta[nome_folder][1].extend(dados)  # Adiciona sem sobrescrever
-                
-                coordenadas_por_pasta.setdefault(nome_folder, []).extend(coordenadas_folder)
-                dados_em_andamento.extend(em_andamento)
-                dados_concluido.extend(concluido)
-
-        # Processa pastas que contenham "CIDADES" no nome
-        if "CIDADES" in nome_folder.upper():
-            for placemark in folder.findall(".//{http://www.opengis.net/kml/2.2}Placemark"):
-                nome = placemark.name.text if hasattr(placemark, 'name') else "Sem Nome"
-                point = placemark.find(".//{http://www.opengis.net/kml/2.2}Point")
-                if point is not None:
-                    coords = point.coordinates.text.strip().split(',')
-                    lon = float(coords[0])
-                    lat = float(coords[1])
-                    cidades_coords.append((nome, (lat, lon)))
-
-        # Processa pastas GPON
-        if "GPON" in nome_folder.upper():
-            if nome_folder not in dados_gpon:
-                dados_gpon[nome_folder] = {"primeiro_nivel": []}
-
-            for subpasta in folder.findall("{http://www.opengis.net/kml/2.2}Folder"):
-                nome_subpasta = subpasta.name.text if hasattr(subpasta, 'name') else "Subpasta Desconhecida"
-                
-                # Evita a duplicação da subpasta
-                if any(sp["nome"] == nome_subpasta for sp in dados_gpon[nome_folder]["primeiro_nivel"]):
-                    continue  # Já adicionamos essa subpasta, então pulamos
-
-                # Processa dados da subpasta
-                dados_subpasta = {"nome": nome_subpasta, "ctos": buscar_ctos(subpasta), "linestrings": []}
-
-                for placemark in subpasta.findall(".//{http://www.opengis.net/kml/2.2}Placemark"):
-                    for line_string in placemark.findall(".//{http://www.opengis.net/kml/2.2}LineString"):
-                        coordinates = line_string.coordinates.text.strip().split()
-                        coordinates = [tuple(map(float, coord.split(',')[:2][::-1])) for coord in coordinates]
-                        distancia = calcular_distancia_linestring(coordinates)
-                        dados_subpasta["linestrings"].append((placemark.name.text if hasattr(placemark, 'name') else "Sem Nome", distancia))
-
-                # Adiciona a subpasta do primeiro nível aos dados da pasta GPON
-                dados_gpon[nome_folder]["primeiro_nivel"].append(dados_subpasta)
-
-    return distancia_total, dados_por_pasta, coordenadas_por_pasta, cidades_coords, dados_gpon, dados_em_andamento, dados_concluido, dados_link_parceiros
-
+# Quantidade de rotas a partir da qual o mapa em camadas GeoJSON é sugerido por padrão
+LIMITE_ROTAS_POLYLINE = 2000
 
 # Função para criar o dashboard GPON
-def criar_dashboard_gpon(dados_gpon):
-    
-    # Inicializa listas para armazenar dados da tabela
-    dados_tabela = []
-    
-    # Itera sobre todas as GPONs e suas subpastas
-    for nome_gpon, dados in dados_gpon.items():
-        if "primeiro_nivel" in dados:
-            for subpasta in dados["primeiro_nivel"]:
-                # Inicializa os totais para a subpasta atual
-                total_rotas = 0
-                total_placemarks = 0
-                soma_distancia = 0.0
-                
-                # Coleta dados de Rotas e Placemarks
-                if "ctos" in subpasta:
-                    for cto in subpasta["ctos"]:
-                        if "rotas" in cto:
-                            total_rotas += len(cto["rotas"])
-                            for rota in cto["rotas"]:
-                                total_placemarks += rota["quantidade_placemarks"]
-                
-                # Calcula a soma das distâncias das LineStrings
-                if "linestrings" in subpasta:
-                    soma_distancia = sum(distancia for _, distancia in subpasta["linestrings"])
-                
-                # Adiciona os dados da subpasta à lista
-                dados_tabela.append([
-                    subpasta["nome"],  # Nome da subpasta
-                    total_rotas,       # Quantidade de rotas
-                    total_placemarks,  # Quantidade de placemarks
-                    soma_distancia     # Soma das distâncias das LineStrings
-                ])
+def criar_dashboard_gpon(tabela_gpon):
+    import pandas as pd
+    
+    # Totais por POP: rotas, CTO's e fibra ótica das LineStrings
+    totais_pop = tabela_gpon.groupby(["GPON", "POP"], sort=False).agg(
+        rotas=("Rota", "count"),
+        ctos=("CTO'S", "sum"),
+        fibra=("Fibra Ótica (metros)", "sum")
+    )
     
     # Cria o DataFrame para a tabela
-    df_tabela = pd.DataFrame(
-        dados_tabela,
-        columns=["POP", "Rotas", "CTO'S", "Fibra Ótica (metros)"]
-    )
+    df_tabela = pd.DataFrame({
+        "POP": totais_pop.index.get_level_values("POP"),
+        "Rotas": totais_pop["rotas"].to_numpy(),
+        "CTO'S": totais_pop["ctos"].to_numpy(),
+        "Fibra Ótica (metros)": totais_pop["fibra"].to_numpy()
+    })
     
     # Adiciona a coluna ID
     df_tabela.insert(0, "ID", range(1, len(df_tabela) + 1))
@@ -336,200 +78,82 @@ def criar_dashboard_gpon(dados_gpon):
     st.dataframe(df_tabela)
 
 # Função para criar uma tabela interativa com seleção de primeiro nível
-def criar_tabela_interativa_gpon(dados_gpon):
+def criar_tabela_interativa_gpon(tabela_gpon):
     # Cria uma lista de opções para o selectbox (primeiro nível)
-    opcoes_primeiro_nivel = ["TODAS"]  # Adiciona a opção "TODAS" no início da lista
-    for nome_gpon, dados in dados_gpon.items():
-        if "primeiro_nivel" in dados:
-            for subpasta in dados["primeiro_nivel"]:
-                opcoes_primeiro_nivel.append(subpasta["nome"])
+    opcoes_primeiro_nivel = ["TODAS"] + tabela_gpon.index.unique().tolist()  # Adiciona a opção "TODAS" no início da lista
     
     # Adiciona um selectbox para selecionar o primeiro nível
-    selecionado = st.selectbox("Selecione o POP para análise:", opcoes_primeiro_nivel)
+    selecionado = st.selectbox("Selecione o POP para análise:", opcoes_primeiro_nivel, key="pop_gpon")
+    exibir_tabelas_gpon(tabela_gpon, selecionado)
+
+    # Retorna o POP selecionado, usado também no mapa das CTO's
+    return selecionado
+
+# Função para exibir as tabelas de rotas e CTO's do POP selecionado (ou de todos)
+def exibir_tabelas_gpon(tabela_gpon, selecionado):
+    import pandas as pd
     
     # Verifica se a opção selecionada é "TODAS"
     if selecionado == "TODAS":
         st.write("### Informações de TODOS os POPs")
-        
-        # Inicializa listas para armazenar dados das tabelas
-        dados_tabela_rotas = []  # Tabela de Rotas e CTO's
-        dados_tabela_quantidade_rotas = []  # Tabela de Quantidade de Rotas por CTO
-        
-        # Itera sobre todas as GPONs e suas subpastas
-        for nome_gpon, dados in dados_gpon.items():
-            if "primeiro_nivel" in dados:
-                for subpasta in dados["primeiro_nivel"]:
-                    # Coleta dados de Rotas e CTO's
-                    if "ctos" in subpasta:
-                        for cto in subpasta["ctos"]:
-                            quantidade_rotas = 0
-                            if "rotas" in cto:
-                                for rota in cto["rotas"]:
-                                    dados_tabela_rotas.append([
-                                        cto["nome"],  # Nome do CTO
-                                        rota["nome_rota"],  # Nome da Rota
-                                        rota["quantidade_placemarks"]  # Quantidade de Placemarks
-                                    ])
-                                    quantidade_rotas += 1
-                            
-                            # Adiciona a quantidade de rotas por CTO
-                            dados_tabela_quantidade_rotas.append([
-                                cto["nome"],  # Nome do CTO
-                                quantidade_rotas  # Quantidade de Rotas
-                            ])
-        
-        # Cria o DataFrame para a tabela de Quantidade de Rotas por CTO
-        df_tabela_quantidade_rotas = pd.DataFrame(
-            dados_tabela_quantidade_rotas,
-            columns=["Projeto", "Rotas"]
-        )
-        
-        # Adiciona a coluna ID
-        df_tabela_quantidade_rotas.insert(0, "ID", range(1, len(df_tabela_quantidade_rotas) + 1))
-        
-        # Adiciona uma linha de total
-        total_rotas = df_tabela_quantidade_rotas["Rotas"].sum()
-        df_tabela_quantidade_rotas.loc["Total"] = ["", "Total", total_rotas]
-        
-        # Define a coluna ID como índice do DataFrame
-        df_tabela_quantidade_rotas.set_index("ID", inplace=True)
-        
-        # Exibe a tabela de Quantidade de Rotas por CTO
-        st.write("#### Quantidade de Rotas por projeto")
-        st.dataframe(df_tabela_quantidade_rotas)
-        
-        # Cria o DataFrame para a tabela de Rotas e CTO's
-        df_tabela_rotas = pd.DataFrame(
-            dados_tabela_rotas,
-            columns=["Projeto", "Rota", "CTO'S"]
-        )
-        
-        # Adiciona a coluna ID
-        df_tabela_rotas.insert(0, "ID", range(1, len(df_tabela_rotas) + 1))
-        
-        # Adiciona uma linha de total
-        total_placemarks = df_tabela_rotas["CTO'S"].sum()
-        df_tabela_rotas.loc["Total"] = ["", "Total", "", total_placemarks]
-        
-        # Define a coluna ID como índice do DataFrame
-        df_tabela_rotas.set_index("ID", inplace=True)
-        
-        # Exibe a tabela de Rotas e CTO's
-        st.write("#### Rotas e CTO's")
-        st.dataframe(df_tabela_rotas)
-    
+        dados = tabela_gpon
     else:
-        # Encontra os dados correspondentes ao primeiro nível selecionado
-        for nome_gpon, dados in dados_gpon.items():
-            if "primeiro_nivel" in dados:
-                for subpasta in dados["primeiro_nivel"]:
-                    if subpasta["nome"] == selecionado:
-                        st.write(f"### Informações de: {selecionado}")
-                        
-                        # Inicializa listas para armazenar dados das tabelas
-                        dados_tabela_rotas = []  # Tabela de Rotas e CTO's
-                        dados_tabela_quantidade_rotas = []  # Tabela de Quantidade de Rotas por CTO
-                        
-                        # Coleta dados de Rotas e CTO's
-                        if "ctos" in subpasta:
-                            for cto in subpasta["ctos"]:
-                                quantidade_rotas = 0
-                                if "rotas" in cto:
-                                    for rota in cto["rotas"]:
-                                        dados_tabela_rotas.append([
-                                            cto["nome"],  # Nome do CTO
-                                            rota["nome_rota"],  # Nome da Rota
-                                            rota["quantidade_placemarks"]  # Quantidade de Placemarks
-                                        ])
-                                        quantidade_rotas += 1
-                                
-                                # Adiciona a quantidade de rotas por CTO
-                                dados_tabela_quantidade_rotas.append([
-                                    cto["nome"],  # Nome do CTO
-                                    quantidade_rotas  # Quantidade de Rotas
-                                ])
-                        
-                        # Cria o DataFrame para a tabela de Quantidade de Rotas por CTO
-                        df_tabela_quantidade_rotas = pd.DataFrame(
-                            dados_tabela_quantidade_rotas,
-                            columns=["Projeto", "Rotas"]
-                        )
-                        
-                        # Adiciona a coluna ID
-                        df_tabela_quantidade_rotas.insert(0, "ID", range(1, len(df_tabela_quantidade_rotas) + 1))
-                        
-                        # Adiciona uma linha de total
-                        total_rotas = df_tabela_quantidade_rotas["Rotas"].sum()
-                        df_tabela_quantidade_rotas.loc["Total"] = ["", "Total", total_rotas]
-                        
-                        # Define a coluna ID como índice do DataFrame
-                        df_tabela_quantidade_rotas.set_index("ID", inplace=True)
-                        
-                        # Exibe a tabela de Quantidade de Rotas por CTO
-                        st.write("#### Quantidade de Rotas por projeto")
-                        st.dataframe(df_tabela_quantidade_rotas)
-                        
-                        # Cria o DataFrame para a tabela de Rotas e CTO's
-                        df_tabela_rotas = pd.DataFrame(
-                            dados_tabela_rotas,
-                            columns=["Projeto", "Rota", "CTO'S"]
-                        )
-                        
-                        # Adiciona a coluna ID
-                        df_tabela_rotas.insert(0, "ID", range(1, len(df_tabela_rotas) + 1))
-                        
-                        # Adiciona uma linha de total
-                        total_placemarks = df_tabela_rotas["CTO'S"].sum()
-                        df_tabela_rotas.loc["Total"] = ["", "Total", "", total_placemarks]
-                        
-                        # Define a coluna ID como índice do DataFrame
-                        df_tabela_rotas.set_index("ID", inplace=True)
-                        
-                        # Exibe a tabela de Rotas e CTO's
-                        st.write("#### Rotas e CTO's")
-                        st.dataframe(df_tabela_rotas)
-
-#verificar codigo
-def calcular_porcentagem_concluida(dados_por_pasta, dados_concluido):
-    porcentagens = {}
+        # O POP é o índice da tabela GPON
+        st.write(f"### Informações de: {selecionado}")
+        dados = tabela_gpon.loc[[selecionado]]
     
-    # Verificação dos dados
-    print("Dados por pasta:", dados_por_pasta)
-    print("Dados concluídos:", dados_concluido)
-   
-    # Itera sobre as pastas e calcula a porcentagem concluída
-    for nome_folder, (distancia_total, _) in dados_por_pasta.items():
-        # Filtra os dados concluídos para a pasta atual
-        distancia_concluida = sum(linha[2] for linha in dados_concluido if linha[0] == nome_folder)
-        
-        # Verifica se a distância total é maior que zero para evitar divisão por zero
-        if distancia_total > 0:
-            porcentagem = (distancia_concluida / distancia_total) * 100
-        else:
-            porcentagem = 0.0
-        
-        # Armazena a porcentagem no dicionário
-        porcentagens[nome_folder] = porcentagem
+    # Quantidade de rotas de cada projeto (pastas CTO'S); as linhas sem projeto são ignoradas
+    rotas_por_projeto = dados.groupby(["GPON", "POP", "Projeto"], sort=False)["Rota"].count()
+    
+    # Cria o DataFrame para a tabela de Quantidade de Rotas por CTO
+    df_tabela_quantidade_rotas = pd.DataFrame({
+        "Projeto": rotas_por_projeto.index.get_level_values("Projeto"),
+        "Rotas": rotas_por_projeto.to_numpy()
+    })
     
-    return porcentagens
+    # Adiciona a coluna ID
+    df_tabela_quantidade_rotas.insert(0, "ID", range(1, len(df_tabela_quantidade_rotas) + 1))
+    
+    # Adiciona uma linha de total
+    total_rotas = df_tabela_quantidade_rotas["Rotas"].sum()
+    df_tabela_quantidade_rotas.loc["Total"] = ["", "Total", total_rotas]
+    
+    # Define a coluna ID como índice do DataFrame
+    df_tabela_quantidade_rotas.set_index("ID", inplace=True)
+    
+    # Exibe a tabela de Quantidade de Rotas por CTO
+    st.write("#### Quantidade de Rotas por projeto")
+    st.dataframe(df_tabela_quantidade_rotas)
+    
+    # Cria o DataFrame para a tabela de Rotas e CTO's
+    rotas = dados[dados["Rota"].notna()]
+    df_tabela_rotas = pd.DataFrame({
+        "Projeto": rotas["Projeto"].to_numpy(),
+        "Rota": rotas["Rota"].to_numpy(),
+        "CTO'S": rotas["CTO'S"].to_numpy()
+    })
+    
+    # Adiciona a coluna ID
+    df_tabela_rotas.insert(0, "ID", range(1, len(df_tabela_rotas) + 1))
+    
+    # Adiciona uma linha de total
+    total_placemarks = df_tabela_rotas["CTO'S"].sum()
+    df_tabela_rotas.loc["Total"] = ["", "Total", "", total_placemarks]
+    
+    # Define a coluna ID como índice do DataFrame
+    df_tabela_rotas.set_index("ID", inplace=True)
+    
+    # Exibe a tabela de Rotas e CTO's
+    st.write("#### Rotas e CTO's")
+    st.dataframe(df_tabela_rotas)
 
 # Função para criar o gráfico de pizza de porcentagem concluída com seleção de pasta
-def criar_grafico_pizza_porcentagem_concluida(porcentagens, dados_por_pasta, root):
-    # Função auxiliar para verificar se uma pasta está dentro de "GPON"
-    def esta_dentro_gpon(pasta, root):
-        # Percorre a hierarquia do KML para verificar se a pasta está dentro de "GPON"
-        for folder in root.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-            nome_folder = folder.name.text if hasattr(folder, 'name') else "Desconhecido"
-            if "GPON" in nome_folder.upper():
-                # Verifica se a pasta "LINK" está dentro desta pasta "GPON"
-                for subfolder in folder.findall(".//{http://www.opengis.net/kml/2.2}Folder"):
-                    subfolder_name = subfolder.name.text if hasattr(subfolder, 'name') else "Subpasta Desconhecida"
-                    if subfolder_name == pasta:
-                        return True
-        return False
+def criar_grafico_pizza_porcentagem_concluida(porcentagens, dados_por_pasta, pastas_dentro_gpon):
+    import pandas as pd
+    import plotly.express as px
 
     # Filtra as pastas que não estão dentro de uma pasta "GPON"
-    pastas_filtradas = [pasta for pasta in porcentagens.keys() if not esta_dentro_gpon(pasta, root)]
+    pastas_filtradas = [pasta for pasta in porcentagens.keys() if pasta not in pastas_dentro_gpon]
 
     # Cria uma lista de opções para o selectbox (apenas pastas filtradas)
     opcoes_pastas = ["Todas os Projetos"] + pastas_filtradas
@@ -586,6 +210,28 @@ def criar_grafico_pizza_porcentagem_concluida(porcentagens, dados_por_pasta, roo
         # Exibe o gráfico no Streamlit
         st.plotly_chart(fig)
 
+# Função para exibir o diagnóstico de desempenho: o tempo de cada etapa e seção, na ordem de execução
+def exibir_diagnostico(diagnostico):
+    import pandas as pd
+
+    tabela = pd.DataFrame({
+        "Etapa": [registro["etapa"] for registro in diagnostico.etapas],
+        "Tempo (ms)": [registro["segundos"] * 1000 for registro in diagnostico.etapas],
+    })
+    if diagnostico.memoria:
+        tabela["Pico de memória (MB)"] = [registro["pico_mb"] for registro in diagnostico.etapas]
+    st.dataframe(tabela.set_index("Etapa"))
+    st.caption(f"Tempo total medido: {diagnostico.total() * 1000:.0f} ms")
+
+    # Com os resultados no cache, as etapas do processamento não são executadas
+    if not any(registro["etapa"] == "distancias" for registro in diagnostico.etapas):
+        st.caption("Resultados obtidos do cache: as etapas do processamento do arquivo não foram executadas nesta execução.")
+
+# Cache de resultados compartilhado entre as sessões e execuções do script
+@st.cache_resource
+def obter_cache_resultados():
+    return criar_cache_resultados()
+
 # Configuração do aplicativo Streamlit
 st.title("Analisador de Projetos de Fibra Ótica")
 st.write("""
@@ -593,277 +239,216 @@ Este aplicativo analisa um arquivo no formato .kml e exibe informações dinâmi
 sobre projetos de fibra ótica, incluindo distâncias, status das rotas, e muito mais.
 """)
 
+# Seleção da precisão do cálculo de distâncias
+modo_distancia = st.selectbox(
+    "Precisão do cálculo de distâncias:",
+    list(MODOS_DISTANCIA),
+    index=list(MODOS_DISTANCIA).index(MODO_PADRAO),
+    format_func=MODOS_DISTANCIA.get
+)
+
 # Upload do arquivo KML
-uploaded_file = st.file_uploader("Carregue um arquivo KML", type=["kml"])
+uploaded_file = st.file_uploader("Carregue um arquivo KML, KMZ ou KML compactado (.kml.gz)", type=EXTENSOES_KML)
 
 # Verifica se um arquivo foi carregado
 if uploaded_file is not None:
+    # Núcleo da análise (pandas, lxml e pykml), carregado apenas depois do upload
+    from lxml import etree
+    from analise_kml import calcular_porcentagem_concluida, criar_tabela_subtotais, processar_kml, processar_kml_streaming
+
+    # Tempo (e, se marcado no painel de diagnóstico, pico de memória) de cada etapa e seção
+    # As etapas também são registradas no log (nível INFO do logger "projetos_kml")
+    diagnostico = Diagnostico(
+        memoria=st.session_state.get("diagnostico_memoria", False),
+        arquivo=uploaded_file.name,
+        bytes=uploaded_file.size
+    )
 
-       # Salva o arquivo temporariamente
-    with open("temp.kml", "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Arquivos muito grandes são lidos em fluxo, sem construir a árvore completa
+    usar_streaming = st.checkbox(
+        "Modo de baixo consumo de memória (arquivos muito grandes)",
+        value=uploaded_file.size > LIMITE_STREAMING_BYTES
+    )
 
-    if validar_kml("temp.kml"):
-        st.write("Processando o arquivo KML...")
-        distancia_total, dados_por_pasta, coordenadas_por_pasta, cidades_coords, dados_gpon, dados_em_andamento, dados_concluido, dados_link_parceiros = processar_kml("temp.kml")
+    # Processos usados na leitura e medição das coordenadas (arquivos pequenos são processados sem paralelismo)
+    trabalhadores = st.number_input(
+        "Processos para a extração (1 = sem paralelismo)",
+        min_value=1,
+        max_value=max(os.cpu_count() or 1, trabalhadores_padrao()),
+        value=trabalhadores_padrao()
+    )
+
+    # O hash do arquivo é calculado uma vez por upload e reaproveitado nas próximas execuções
+    hashes_upload = st.session_state.setdefault("hashes_upload", {})
+    if uploaded_file.file_id not in hashes_upload:
+        with diagnostico.etapa("hash"):
+            hashes_upload[uploaded_file.file_id] = calcular_hash_conteudo(uploaded_file.getbuffer())
+
+    # Busca os resultados já processados para o mesmo arquivo e configurações
+    cache_resultados = obter_cache_resultados()
+    chave_resultados = cache_resultados.chave(
+        hashes_upload[uploaded_file.file_id],
+        modo_distancia=modo_distancia,
+        streaming=usar_streaming
+    )
+    with diagnostico.etapa("cache"):
+        resultados = cache_resultados.obter(chave_resultados)
+
+    if resultados is None:
+        # O arquivo é lido direto do buffer em memória da sessão, sem cópia em disco;
+        # KMZ e .kml.gz são descompactados em fluxo durante a leitura
+        uploaded_file.seek(0)
+        try:
+            documento, kmz = abrir_kml(uploaded_file)
+
+            if usar_streaming:
+                # A validação acontece durante a própria leitura em fluxo
+                st.write("Processando o arquivo KML...")
+                try:
+                    resultados = processar_kml_streaming(documento, modo_distancia, trabalhadores=trabalhadores, kmz=kmz, diagnostico=diagnostico)
+                except etree.XMLSyntaxError as e:
+                    exibir_erro_sintaxe(e)
+                    st.stop()  # Interrompe a execução se o arquivo for inválido
+            else:
+                # Analisa o arquivo uma única vez; a mesma raiz é usada na extração e nos gráficos
+                with diagnostico.etapa("analise_xml"):
+                    root = validar_kml(documento)
+                if root is None:
+                    st.stop()  # Interrompe a execução se o arquivo for inválido
+
+                st.write("Processando o arquivo KML...")
+                resultados = processar_kml(root, modo_distancia, trabalhadores=trabalhadores, kmz=kmz, diagnostico=diagnostico)
+        except (zipfile.BadZipFile, OSError, EOFError, ValueError) as e:
+            st.error(f"Não foi possível ler o arquivo enviado: {e}")
+            st.stop()  # Interrompe a execução se o arquivo compactado for inválido
+
+        cache_resultados.guardar(chave_resultados, resultados)
+
+    # Campos dos resultados (ResultadosKML) usados no painel
+    dados_por_pasta = resultados.dados_por_pasta
+    coordenadas_por_pasta = resultados.coordenadas_por_pasta
+    cidades_coords = resultados.cidades_coords
+    dados_gpon = resultados.dados_gpon
+    desvio = resultados.desvio
+    pastas_dentro_gpon = resultados.pastas_dentro_gpon
+    limites = resultados.limites
+    registros_rotas = resultados.registros_rotas
+    tabela_gpon = resultados.tabela_gpon
+    distancia_concluida_por_pasta = resultados.distancia_concluida_por_pasta
+    icone_cidades = resultados.icone_cidades
+
+    # Informa o custo de precisão do modo escolhido em relação ao geodesic exato
+    if desvio["modo"] == "geodesic":
+        st.caption("Distâncias calculadas com a geodésica exata (Karney).")
     else:
-        st.stop()  # Interrompe a execução se o arquivo for inválido
+        st.caption(
+            f"Desvio máximo em relação à geodésica exata ({desvio['segmentos_avaliados']} segmentos avaliados): "
+            f"{desvio['desvio_segmento_m']:.3f} m por segmento ({desvio['desvio_relativo'] * 100:.4f}%), "
+            f"estimado em até {desvio['desvio_rota_m']:.1f} m na rota mais longa."
+        )
       
     # Exibe o mapa e outras informações
     st.subheader("Mapa do Link entre Cidades")
-    
-    # Cria o mapa Folium
-    mapa = folium.Map(location=[-5.0892, -42.8016], zoom_start=5, tiles="Esri WorldImagery")
-    
-    # Adiciona LineStrings e marcadores ao mapa
-    for nome_folder, coordenadas_folder in coordenadas_por_pasta.items():
-        for nome_placemark, coordinates, color, line_style in coordenadas_folder:
-            # Calcula a distância da LineString
-            distancia = calcular_distancia_linestring(coordinates)
-            
-            # Define o estilo da linha
-            if line_style == "dashed":
-                dash_array = "7, 7"  # Tracejado mais perceptível
-                weight = 4  # Espessura maior para destacar
-                opacity = 1.0  # Opacidade total (sem linha de fundo)
-            else:
-                dash_array = None  # Linha sólida
-                weight = 4  # Espessura padrão
-                opacity = 1.0  # Opacidade padrão
-            
-            # Adiciona a LineString ao mapa
-            folium.PolyLine(
-                coordinates,
-                color=color,  # Cor da linha
-                weight=weight,  # Espessura da linha
-                opacity=opacity,  # Opacidade da linha
-                dash_array=dash_array,  # Aplica o tracejado apenas para "EM ANDAMENTO"
-                tooltip=f"{nome_folder} - {nome_placemark} | Distância: {distancia} metros"
-            ).add_to(mapa)
-    
-    # Adiciona marcadores das cidades ao mapa com ícone personalizado
-    for nome_cidade, coords in cidades_coords:
-        casa_icon = CustomIcon(
-            icon_image="https://fontetelecom.com.br/infraestrutura/assets/img/logo/logo-1.png",  # URL de um ícone de casa
-            icon_size=(40, 20)  # Tamanho do ícone (largura, altura)
-        )
-        
-        folium.Marker(
-            location=coords,
-            tooltip=nome_cidade,
-            icon=casa_icon  # Usa o ícone personalizado
-        ).add_to(mapa)
-    
-    # Exibe o mapa no Streamlit
-    folium_static(mapa)
-    
-    # Exibe tabela para "LINK PARCEIROS"
-    if dados_link_parceiros:
-        st.subheader("ROTAS LINK PARCEIROS")
-        
-        # Cria o DataFrame para a tabela dos "LINK PARCEIROS"
-        df_link_parceiros = pd.DataFrame(
-            dados_link_parceiros,
-            columns=["Pasta", "Rota", "Distância (m)"]
-        )
-        
-        # Adiciona a coluna ID
-        df_link_parceiros.insert(0, "ID", range(1, len(df_link_parceiros) + 1))
-        
-        # Calcula o subtotal por pasta
-        subtotal_por_pasta = df_link_parceiros.groupby("Pasta")["Distância (m)"].sum().reset_index()
-        subtotal_por_pasta.columns = ["Pasta", "Subtotal"]
-        
-        # Cria uma lista para armazenar as linhas da tabela
-        dados_tabela_link_parceiros = []
-        
-        # Adiciona todas as rotas primeiro
-        for _, rota in df_link_parceiros.iterrows():
-            dados_tabela_link_parceiros.append([rota["ID"], rota["Pasta"], rota["Rota"], rota["Distância (m)"]])
-        
-        # Adiciona os subtotais no final
-        for _, subtotal in subtotal_por_pasta.iterrows():
-            dados_tabela_link_parceiros.append(["", subtotal["Pasta"], "Subtotal", subtotal["Subtotal"]])
-        
-        # Calcula o total geral
-        total_geral = df_link_parceiros["Distância (m)"].sum()
-        
-        # Adiciona a linha de total geral
-        dados_tabela_link_parceiros.append(["", "Total", "", total_geral])
-        
-        # Cria o DataFrame final
-        df_tabela_final = pd.DataFrame(
-            dados_tabela_link_parceiros,
-            columns=["ID", "Pasta", "Rota", "Distância (m)"]
-        )
-        
-        # Define a coluna ID como índice do DataFrame
-        df_tabela_final.set_index("ID", inplace=True)
-        
-        # Exibe a tabela
-        st.dataframe(df_tabela_final)
-    
-    # Exibe tabelas para pastas LINK
-    st.subheader("Quantidade de Fibra Ótica projetada - LINK")
-    
-    # Lista para armazenar todos os dados
-    dados_tabela_pastas = []
-    
-    # Adiciona os dados gerais (não "EM ANDAMENTO" ou "CONCLUÍDO")
-    for nome_folder, (distancia_folder, dados) in dados_por_pasta.items():
-        for linha in dados:
-            dados_tabela_pastas.append([nome_folder, linha[1], linha[2]])  # [Pasta, Rota, Distância]
-    
-    # Adiciona os dados de "EM ANDAMENTO"
-    for linha in dados_em_andamento:
-        dados_tabela_pastas.append([linha[0], linha[1], linha[2]])  # [Pasta, Rota, Distância]
-    
-    # Adiciona os dados de "CONCLUÍDO"
-    for linha in dados_concluido:
-        dados_tabela_pastas.append([linha[0], linha[1], linha[2]])  # [Pasta, Rota, Distância]
-    
-    # Cria o DataFrame principal
-    df_tabela_pastas = pd.DataFrame(
-        dados_tabela_pastas,
-        columns=["Pasta", "ROTAS LINK", "Distância (m)"]
-    )
-    
-    # Agrupa os dados por pasta e calcula os subtotais
-    subtotais_pastas = df_tabela_pastas.groupby("Pasta")["Distância (m)"].sum().reset_index()
-    subtotais_pastas.columns = ["Pasta", "Subtotal"]
-    
-    # Adiciona uma coluna de ID ao DataFrame principal
-    df_tabela_pastas.insert(0, "ID", range(1, len(df_tabela_pastas) + 1))
-    
-    # Cria uma lista para armazenar as linhas da tabela final
-    dados_tabela_final = []
-    
-    # Adiciona todas as rotas primeiro
-    for _, linha in df_tabela_pastas.iterrows():
-        dados_tabela_final.append([linha["ID"], linha["Pasta"], linha["ROTAS LINK"], linha["Distância (m)"]])
-    
-    # Adiciona os subtotais por pasta
-    for _, subtotal in subtotais_pastas.iterrows():
-        dados_tabela_final.append(["", subtotal["Pasta"], "Subtotal", subtotal["Subtotal"]])
-    
-    # Calcula o total geral
-    total_geral = df_tabela_pastas["Distância (m)"].sum()
-    
-    # Adiciona a linha de total geral
-    dados_tabela_final.append(["", "Total", "", total_geral])
-    
-    # Cria o DataFrame final
-    df_tabela_final = pd.DataFrame(
-        dados_tabela_final,
-        columns=["ID", "Pasta", "ROTAS LINK", "Distância (m)"]
+
+    # Redes grandes são desenhadas em camadas GeoJSON, em vez de uma PolyLine por rota
+    mapa_em_camadas = st.checkbox(
+        "Mapa em camadas GeoJSON (redes grandes)",
+        value=sum(len(rotas) for rotas in coordenadas_por_pasta.values()) > LIMITE_ROTAS_POLYLINE
     )
-    
-    # Define a coluna ID como índice do DataFrame
-    df_tabela_final.set_index("ID", inplace=True)
-    
-    # Exibe a tabela
-    st.dataframe(df_tabela_final)
-    
-    # Exibe tabelas para "EM ANDAMENTO" e "CONCLUÍDO"
-    if dados_em_andamento or dados_concluido:
-        st.subheader("Status das Rotas - LINK")
-        
-        # Tabela para "EM ANDAMENTO"
-        if dados_em_andamento:
-            st.write("#### Rotas em Andamento")
-            df_em_andamento = pd.DataFrame(
-                dados_em_andamento,
-                columns=["Pasta", "Rota", "Distância (m)"]
-            )
-            df_em_andamento.insert(0, "ID", range(1, len(df_em_andamento) + 1))
-            
-            # Calcula o subtotal por pasta
-            subtotal_em_andamento = df_em_andamento.groupby("Pasta")["Distância (m)"].sum().reset_index()
-            subtotal_em_andamento.columns = ["Pasta", "Subtotal"]
-            
-            # Cria uma lista para armazenar as linhas da tabela
-            dados_tabela_em_andamento = []
-            
-            # Adiciona todas as rotas primeiro
-            for _, rota in df_em_andamento.iterrows():
-                dados_tabela_em_andamento.append([rota["ID"], rota["Pasta"], rota["Rota"], rota["Distância (m)"]])
-            
-            # Adiciona os subtotais no final
-            for _, subtotal in subtotal_em_andamento.iterrows():
-                dados_tabela_em_andamento.append(["", subtotal["Pasta"], "Subtotal", subtotal["Subtotal"]])
-            
-            # Calcula o total geral
-            total_em_andamento = df_em_andamento["Distância (m)"].sum()
-            
-            # Adiciona a linha de total geral
-            dados_tabela_em_andamento.append(["", "Total", "", total_em_andamento])
-            
-            # Cria o DataFrame final
-            df_tabela_final_em_andamento = pd.DataFrame(
-                dados_tabela_em_andamento,
-                columns=["ID", "Pasta", "Rota", "Distância (m)"]
-            )
-            
-            # Define a coluna ID como índice do DataFrame
-            df_tabela_final_em_andamento.set_index("ID", inplace=True)
-            
-            # Exibe a tabela
-            st.dataframe(df_tabela_final_em_andamento)
-        
-        # Tabela para "CONCLUÍDO"
-        if dados_concluido:
-            st.write("#### Rotas Concluídas")
-            df_concluido = pd.DataFrame(
-                dados_concluido,
-                columns=["Pasta", "Rota", "Distância (m)"]
-            )
-            df_concluido.insert(0, "ID", range(1, len(df_concluido) + 1))
-            
-            # Calcula o subtotal por pasta
-            subtotal_concluido = df_concluido.groupby("Pasta")["Distância (m)"].sum().reset_index()
-            subtotal_concluido.columns = ["Pasta", "Subtotal"]
-            
-            # Cria uma lista para armazenar as linhas da tabela
-            dados_tabela_concluido = []
-            
-            # Adiciona todas as rotas primeiro
-            for _, rota in df_concluido.iterrows():
-                dados_tabela_concluido.append([rota["ID"], rota["Pasta"], rota["Rota"], rota["Distância (m)"]])
-            
-            # Adiciona os subtotais no final
-            for _, subtotal in subtotal_concluido.iterrows():
-                dados_tabela_concluido.append(["", subtotal["Pasta"], "Subtotal", subtotal["Subtotal"]])
-            
-            # Calcula o total geral
-            total_concluido = df_concluido["Distância (m)"].sum()
-            
-            # Adiciona a linha de total geral
-            dados_tabela_concluido.append(["", "Total", "", total_concluido])
-            
-            # Cria o DataFrame final
-            df_tabela_final_concluido = pd.DataFrame(
-                dados_tabela_concluido,
-                columns=["ID", "Pasta", "Rota", "Distância (m)"]
-            )
-            
-            # Define a coluna ID como índice do DataFrame
-            df_tabela_final_concluido.set_index("ID", inplace=True)
-            
-            # Exibe a tabela
-            st.dataframe(df_tabela_final_concluido)
-
-    # Obtém o root do KML
-    with open("temp.kml", 'r', encoding='utf-8') as arquivo:
-        root = parser.parse(arquivo).getroot()
-    
-    # Calcula a porcentagem concluída por pasta
-    porcentagens_concluidas = calcular_porcentagem_concluida(dados_por_pasta, dados_concluido)
-    
-    # Cria o gráfico de porcentagem concluída
-    grafico_porcentagem = criar_grafico_pizza_porcentagem_concluida(porcentagens_concluidas, dados_por_pasta, root)
+
+    # Por padrão as rotas são simplificadas para o zoom inicial, o que reduz muito o HTML do mapa
+    detalhe_completo = st.checkbox("Exibir rotas com detalhe completo no mapa", value=False)
+
+    # O mapa abre enquadrado nas rotas e cidades, ou no POP selecionado no dashboard GPON
+    limites_mapa = limites
+    pop_mapa = st.session_state.get("pop_gpon", "TODAS")
+    if pop_mapa != "TODAS" and st.checkbox("Enquadrar o mapa no POP selecionado no dashboard GPON", value=False):
+        for dados in dados_gpon.values():
+            for subpasta in dados["primeiro_nivel"]:
+                if subpasta["nome"] == pop_mapa and subpasta["limites"] is not None:
+                    limites_mapa = subpasta["limites"]
+    else:
+        pop_mapa = "TODAS"
+
+    # O HTML do mapa também fica no cache, junto dos resultados
+    chave_mapa = chave_resultados + ("-mapa-geojson" if mapa_em_camadas else "-mapa") + ("-completo" if detalhe_completo else "") + f"-pop-{pop_mapa}"
+    with diagnostico.etapa("secao_mapa"):
+        mapa_html = cache_resultados.obter(chave_mapa)
+        if mapa_html is None:
+            from mapas_kml import criar_mapa_geojson_html, criar_mapa_html  # Carrega o folium
+            if mapa_em_camadas:
+                mapa_html = criar_mapa_geojson_html(coordenadas_por_pasta, cidades_coords, detalhe_completo, limites_mapa, icone_cidades)
+            else:
+                mapa_html = criar_mapa_html(coordenadas_por_pasta, cidades_coords, detalhe_completo, limites_mapa, icone_cidades)
+            cache_resultados.guardar(chave_mapa, mapa_html)
+
+        # Exibe o mapa no Streamlit (mesmo layout do folium_static)
+        st.iframe(mapa_html, height=510, width=700)
+    
+    with diagnostico.etapa("secao_tabelas_link"):
+        # Rotas LINK (fora das pastas GPON), na ordem: gerais, "EM ANDAMENTO" e "CONCLUÍDO"
+        rotas_link = registros_rotas[~registros_rotas["Parceiros"] & ~registros_rotas["GPON"]]
+        ordem_status = rotas_link["Status"].map({"em_andamento": 1, "concluido": 2}).fillna(0).to_numpy()
+        rotas_link = rotas_link.iloc[np.argsort(ordem_status, kind="stable")]
+
+        # Exibe tabela para "LINK PARCEIROS"
+        rotas_parceiros = registros_rotas[registros_rotas["Parceiros"]]
+        if len(rotas_parceiros):
+            st.subheader("ROTAS LINK PARCEIROS")
+            st.dataframe(criar_tabela_subtotais(rotas_parceiros))
+    
+        # Exibe tabelas para pastas LINK
+        st.subheader("Quantidade de Fibra Ótica projetada - LINK")
+        st.dataframe(criar_tabela_subtotais(rotas_link, coluna_rota="ROTAS LINK"))
+    
+        # Exibe tabelas para "EM ANDAMENTO" e "CONCLUÍDO"
+        rotas_em_andamento = rotas_link[rotas_link["Status"] == "em_andamento"]
+        rotas_concluidas = rotas_link[rotas_link["Status"] == "concluido"]
+        if len(rotas_em_andamento) or len(rotas_concluidas):
+            st.subheader("Status das Rotas - LINK")
+        
+            # Tabela para "EM ANDAMENTO"
+            if len(rotas_em_andamento):
+                st.write("#### Rotas em Andamento")
+                st.dataframe(criar_tabela_subtotais(rotas_em_andamento))
+        
+            # Tabela para "CONCLUÍDO"
+            if len(rotas_concluidas):
+                st.write("#### Rotas Concluídas")
+                st.dataframe(criar_tabela_subtotais(rotas_concluidas))
+
+    with diagnostico.etapa("secao_grafico_pizza"):
+        # Calcula a porcentagem concluída por pasta
+        porcentagens_concluidas = calcular_porcentagem_concluida(dados_por_pasta, distancia_concluida_por_pasta)
+        
+        # Cria o gráfico de porcentagem concluída
+        grafico_porcentagem = criar_grafico_pizza_porcentagem_concluida(porcentagens_concluidas, dados_por_pasta, pastas_dentro_gpon)
     
     # Exibe o dashboard GPON
-    criar_dashboard_gpon(dados_gpon)
+    with diagnostico.etapa("secao_dashboard_gpon"):
+        criar_dashboard_gpon(tabela_gpon)
     
     # Exibe a tabela interativa
-    criar_tabela_interativa_gpon(dados_gpon)
+    with diagnostico.etapa("secao_tabela_gpon"):
+        pop_selecionado = criar_tabela_interativa_gpon(tabela_gpon)
+
+    # Exibe as CTO's do POP selecionado no mapa
+    if any(rota["pontos"] for dados in dados_gpon.values() for subpasta in dados["primeiro_nivel"] for cto in subpasta["ctos"] for rota in cto["rotas"]):
+        with diagnostico.etapa("secao_mapa_ctos"):
+            st.subheader("Mapa das CTO'S")
+            chave_mapa_ctos = f"{chave_resultados}-ctos-{pop_selecionado}"
+            mapa_ctos_html = cache_resultados.obter(chave_mapa_ctos)
+            if mapa_ctos_html is None:
+                from mapas_kml import criar_mapa_ctos_html  # Carrega o folium
+                mapa_ctos_html = criar_mapa_ctos_html(dados_gpon, pop_selecionado)
+                cache_resultados.guardar(chave_mapa_ctos, mapa_ctos_html)
+            st.iframe(mapa_ctos_html, height=510, width=700)
+
+    # Painel de diagnóstico com as etapas desta execução
+    with st.expander("Diagnóstico de desempenho"):
+        st.checkbox(
+            "Medir o pico de memória de cada etapa",
+            key="diagnostico_memoria",
+            help="Usa o tracemalloc, que deixa o processamento mais lento. A memória dos processos da extração em paralelo não é medida."
+        )
+        exibir_diagnostico(diagnostico)
@@ -0,0 +1,157 @@
+# Armazenamento compacto das coordenadas das rotas.
+#
+# Todas as LineStrings do arquivo ficam em um único array contínuo (N, 2) de
+# (latitude, longitude), e "inicios" guarda o deslocamento de cada rota: a rota
+# i ocupa as linhas inicios[i] até inicios[i + 1] - 1. Os dados de exibição de
+# cada rota (pasta, nome, cor, estilo da linha, distância medida na extração,
+# status e se é de parceiros) ficam em registros com __slots__, que apenas
+# apontam para o armazém.
+#
+# ler_coordenadas é o leitor único dos blocos <coordinates> do KML, e
+# calcular_limites dá o retângulo envolvente usado para enquadrar os mapas.
+from array import array
+
+import numpy as np
+
+
+# Função para converter o texto de um bloco <coordinates> ("lon,lat[,alt] lon,lat[,alt] ...")
+# em um array (N, 2) de (latitude, longitude). Todo o texto é lido de uma vez com
+# np.fromstring; a altitude, se houver, é descartada. Textos irregulares (dimensões
+# misturadas, espaços depois das vírgulas) são lidos ponto a ponto.
+def ler_coordenadas(texto):
+    texto = texto.strip() if texto else ""
+    if not texto:
+        return np.zeros((0, 2))
+
+    dimensoes = texto.split(None, 1)[0].count(",") + 1
+    try:
+        valores = np.fromstring(texto.replace(",", " "), sep=" ")
+    except ValueError:
+        return _ler_coordenadas_por_ponto(texto)
+
+    # Cada ponto tem "dimensoes" valores e "dimensoes - 1" vírgulas
+    quantidade = len(valores) // dimensoes
+    if dimensoes < 2 or len(valores) != quantidade * dimensoes or texto.count(",") != quantidade * (dimensoes - 1):
+        return _ler_coordenadas_por_ponto(texto)
+
+    return valores.reshape(quantidade, dimensoes)[:, 1::-1].copy()
+
+
+# Função para ler as coordenadas ponto a ponto (caminho lento, para textos irregulares)
+def _ler_coordenadas_por_ponto(texto):
+    pontos = [coord.split(',') for coord in texto.replace(", ", ",").split()]
+    return np.array([(float(ponto[1]), float(ponto[0])) for ponto in pontos], dtype=np.float64).reshape(-1, 2)
+
+
+# Função para calcular o retângulo envolvente [[lat_min, lon_min], [lat_max, lon_max]]
+# de um ou mais conjuntos de pontos (latitude, longitude). Retorna None se não houver pontos.
+def calcular_limites(*conjuntos):
+    pontos = [np.asarray(conjunto, dtype=np.float64).reshape(-1, 2) for conjunto in conjuntos if len(conjunto)]
+    if not pontos:
+        return None
+    pontos = np.concatenate(pontos)
+    return [pontos.min(axis=0).tolist(), pontos.max(axis=0).tolist()]
+
+
+class ArmazemCoordenadas:
+    __slots__ = ("coordenadas", "inicios", "_buffer", "_inicios", "_tipo")
+
+    # "tipo" pode ser np.float32 para reduzir a memória pela metade
+    # (precisão de ~0,5 m nas coordenadas); as distâncias são sempre calculadas em float64
+    def __init__(self, tipo=np.float64):
+        self._tipo = np.dtype(tipo)
+        self._buffer = array("d")  # Latitude e longitude intercaladas
+        self._inicios = array("q", [0])
+        self.coordenadas = np.zeros((0, 2), dtype=self._tipo)
+        self.inicios = np.zeros(1, dtype=np.int64)
+
+    # Adiciona uma rota a partir de um array (N, 2) de (latitude, longitude)
+    # Retorna o índice da rota no armazém
+    def adicionar(self, coordenadas):
+        self._buffer.frombytes(np.ascontiguousarray(coordenadas, dtype=np.float64).tobytes())
+        self._inicios.append(len(self._buffer) // 2)
+        return len(self._inicios) - 2
+
+    # Adiciona uma rota a partir do texto de um bloco <coordinates>
+    def adicionar_texto(self, texto):
+        return self.adicionar(ler_coordenadas(texto))
+
+    # Carrega rotas já lidas: as coordenadas (N, 2) concatenadas e a quantidade de pontos de cada rota
+    def carregar(self, coordenadas, contagens):
+        self.coordenadas = np.asarray(coordenadas).astype(self._tipo, copy=False)
+        self.inicios = np.concatenate(([0], np.cumsum(contagens, dtype=np.int64)))
+        return self
+
+    # Converte os buffers de construção nos arrays NumPy definitivos
+    def finalizar(self):
+        self.coordenadas = np.frombuffer(self._buffer, dtype=np.float64).reshape(-1, 2).astype(self._tipo)
+        self.inicios = np.frombuffer(self._inicios, dtype=np.int64).copy()
+        self._buffer = array("d")
+        self._inicios = array("q", [0])
+        return self
+
+    def __len__(self):
+        return len(self.inicios) - 1
+
+    # Coordenadas (visão, sem cópia) da rota i
+    def rota(self, i):
+        return self.coordenadas[self.inicios[i]:self.inicios[i + 1]]
+
+    # Coordenadas das rotas indicadas, concatenadas
+    def selecionar(self, linhas):
+        marcadas = np.zeros(len(self), dtype=bool)
+        marcadas[np.asarray(linhas, dtype=np.int64)] = True
+        return self.coordenadas[np.repeat(marcadas, np.diff(self.inicios))]
+
+    # Retângulo envolvente de cada rota, calculado de uma vez para todas com reduceat:
+    # arrays (rotas, 2) com os mínimos e os máximos de (latitude, longitude); rotas vazias ficam com NaN
+    def limites_rotas(self):
+        minimos = np.full((len(self), 2), np.nan)
+        maximos = np.full((len(self), 2), np.nan)
+        cheias = np.diff(self.inicios) > 0
+        if cheias.any():
+            # As rotas vazias ficam de fora dos índices: o reduceat não aceita segmentos vazios
+            inicios = self.inicios[:-1][cheias]
+            minimos[cheias] = np.minimum.reduceat(self.coordenadas, inicios, axis=0)
+            maximos[cheias] = np.maximum.reduceat(self.coordenadas, inicios, axis=0)
+        return minimos, maximos
+
+
+# Textos dos blocos <coordinates> guardados sem leitura, na ordem das rotas.
+# Usado pela extração em paralelo (extracao_paralela), que lê e mede as rotas em
+# outros processos e depois as carrega em um ArmazemCoordenadas.
+class TextosCoordenadas:
+    __slots__ = ("textos", "tipo")
+
+    def __init__(self, tipo=np.float64):
+        self.textos = []
+        self.tipo = np.dtype(tipo)
+
+    def adicionar_texto(self, texto):
+        self.textos.append(texto or "")
+        return len(self.textos) - 1
+
+    def finalizar(self):
+        return self
+
+    def __len__(self):
+        return len(self.textos)
+
+
+class Rota:
+    __slots__ = ("pasta", "nome", "cor", "estilo", "armazem", "linha", "distancia", "status", "parceiros")
+
+    def __init__(self, pasta, nome, cor, estilo, armazem, linha, distancia, status=None, parceiros=False):
+        self.pasta = pasta
+        self.nome = nome
+        self.cor = cor
+        self.estilo = estilo  # "solid" ou "dashed"
+        self.armazem = armazem
+        self.linha = linha  # Índice da rota no armazém
+        self.distancia = distancia  # Metros, arredondada; medida uma única vez na extração
+        self.status = status  # "em_andamento", "concluido" ou None
+        self.parceiros = parceiros  # Rota de uma pasta "LINK PARCEIROS"
+
+    @property
+    def coordenadas(self):
+        return self.armazem.rota(self.linha)
@@ -0,0 +1,68 @@
+# Simplificação das rotas para a exibição no mapa (nível de detalhe).
+#
+# As LineStrings são simplificadas com Douglas-Peucker usando uma tolerância
+# ligada ao zoom do mapa: em cada nível de zoom um pixel da tela cobre
+# 360 / (256 * 2^zoom) graus de longitude, e pontos que se afastam da linha
+# simplificada menos do que TOLERANCIA_PIXELS pixels não aparecem na tela.
+#
+# A simplificação serve apenas para o desenho; as distâncias continuam vindo
+# da geometria completa, medida na extração.
+import numpy as np
+
+# Desvio máximo, em pixels da tela, entre a linha original e a simplificada
+TOLERANCIA_PIXELS = 1.0
+
+
+# Função para converter um nível de zoom do mapa na tolerância da simplificação (em graus)
+def tolerancia_zoom(zoom, pixels=TOLERANCIA_PIXELS):
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+# Função para estimar o maior zoom em que o retângulo envolvente
+# [[lat_min, lon_min], [lat_max, lon_max]] cabe em um mapa de largura x altura pixels
+def zoom_limites(limites, largura=700, altura=500, zoom_maximo=18):
+    (lat_min, lon_min), (lat_max, lon_max) = limites
+    # Na projeção de Mercator, o eixo vertical cresce com ln(tan(pi/4 + lat/2))
+    y_min, y_max = np.log(np.tan(np.pi / 4 + np.radians([lat_min, lat_max]) / 2))
+    zoom_x = np.log2(largura * 360.0 / (256 * max(lon_max - lon_min, 1e-9)))
+    zoom_y = np.log2(altura * 2 * np.pi / (256 * max(y_max - y_min, 1e-9)))
+    return int(max(0, min(zoom_x, zoom_y, zoom_maximo)))
+
+
+# Função para simplificar uma LineString (array (N, 2) de latitude e longitude) com Douglas-Peucker.
+# A longitude é corrigida pelo cosseno da latitude, para que a tolerância valha igualmente nos dois eixos.
+# Retorna os pontos mantidos, sempre incluindo o primeiro e o último.
+def douglas_peucker(coordenadas, tolerancia):
+    quantidade = len(coordenadas)
+    if quantidade < 3 or tolerancia <= 0:
+        return coordenadas
+
+    pontos = np.asarray(coordenadas, dtype=np.float64)
+    pontos = np.column_stack((pontos[:, 0], pontos[:, 1] * np.cos(np.radians(pontos[:, 0].mean()))))
+
+    manter = np.zeros(quantidade, dtype=bool)
+    manter[0] = manter[-1] = True
+    pilha = [(0, quantidade - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+
+        # Distância de cada ponto intermediário até o segmento inicio-fim
+        origem = pontos[inicio]
+        direcao = pontos[fim] - origem
+        relativos = pontos[inicio + 1:fim] - origem
+        comprimento = np.hypot(direcao[0], direcao[1])
+        if comprimento == 0:
+            afastamentos = np.hypot(relativos[:, 0], relativos[:, 1])
+        else:
+            afastamentos = np.abs(direcao[0] * relativos[:, 1] - direcao[1] * relativos[:, 0]) / comprimento
+
+        mais_distante = int(np.argmax(afastamentos))
+        if afastamentos[mais_distante] > tolerancia:
+            meio = inicio + 1 + mais_distante
+            manter[meio] = True
+            pilha.append((inicio, meio))
+            pilha.append((meio, fim))
+
+    return coordenadas[manter]
@@ -0,0 +1,79 @@
+# Verificações das fronteiras entre rotas na medição em lote (calcular_distancias_lote)
+# e na medição por blocos da extração em paralelo (medir_bloco).
+#
+# Uso:
+#   python -m pytest -q tests
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distancias import calcular_distancias_lote, distancias_segmentos
+from extracao_paralela import medir_bloco
+
+# Rotas de 0, 1 e vários pontos, com as vazias no início, no meio e no fim do lote
+ROTAS = [
+    [],
+    [(-4.0, -41.0), (-4.01, -41.01), (-4.02, -41.0)],
+    [],
+    [(-5.0, -42.0)],
+    [(-3.0, -40.0), (-3.1, -40.2)],
+    [],
+    [(-6.0, -43.0)],
+    [],
+]
+
+
+# Função para concatenar as rotas no formato de calcular_distancias_lote
+def _lote(rotas):
+    contagens = np.array([len(rota) for rota in rotas], dtype=np.int64)
+    coordenadas = np.array([ponto for rota in rotas for ponto in rota], dtype=np.float64).reshape(-1, 2)
+    return coordenadas, np.cumsum(contagens) - contagens
+
+
+# Função para medir cada rota separadamente, como referência
+def _totais_esperados(rotas, modo):
+    return [float(distancias_segmentos(rota, modo).sum()) for rota in rotas]
+
+
+@pytest.mark.parametrize("modo", ["haversine", "vincenty"])
+@pytest.mark.parametrize("rotas", [
+    ROTAS,
+    ROTAS[:2],  # Termina com uma rota com pontos
+    ROTAS[-3:],  # Termina com uma rota vazia após uma rota de um ponto
+    [[]],
+    [[], []],
+    [[(-5.0, -42.0)]],
+    [[(-5.0, -42.0)], []],
+])
+def test_totais_por_rota(rotas, modo):
+    coordenadas, inicios = _lote(rotas)
+    segmentos, totais = calcular_distancias_lote(coordenadas, inicios, modo)
+
+    assert len(segmentos) == max(len(coordenadas) - 1, 0)
+    assert np.allclose(totais, _totais_esperados(rotas, modo))
+
+
+def test_fronteiras_zeradas():
+    coordenadas, inicios = _lote(ROTAS)
+    segmentos, totais = calcular_distancias_lote(coordenadas, inicios)
+
+    # Apenas os segmentos internos às rotas têm distância; os que ligam duas rotas valem zero
+    assert np.isclose(segmentos.sum(), totais.sum())
+    assert np.count_nonzero(segmentos) == 3
+
+
+def test_medir_bloco_termina_com_rota_vazia():
+    textos = ["-41,-4 -41.01,-4.01", "", "-40,-3,0 -40.2,-3.1,0", " "]
+    coordenadas, contagens, segmentos, totais = medir_bloco(textos)
+
+    assert contagens.tolist() == [2, 0, 2, 0]
+    assert len(coordenadas) == 4
+    assert totais[1] == 0.0 and totais[3] == 0.0
+    assert np.allclose(totais[[0, 2]], [
+        distancias_segmentos([(-4.0, -41.0), (-4.01, -41.01)]).sum(),
+        distancias_segmentos([(-3.0, -40.0), (-3.1, -40.2)]).sum(),
+    ])